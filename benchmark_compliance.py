@@ -0,0 +1,245 @@
+"""Benchmark the compliance endpoints against an in-process app on SQLite.
+
+Builds a synthetic household (one user, N family members, supplements, reminders and
+intakes) from a seeded generator for each data size, then times every compliance
+endpoint through the Flask test client and counts the SQL statements it runs.
+
+    python benchmark_compliance.py --sizes small,medium --repeat 5
+    python benchmark_compliance.py --sizes large --json bench_output.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta, time as dt_time
+
+# Synthetic data sizes: household members, supplements per member and days of history
+SIZES = {
+    'small': {'family_members': 3, 'supplements': 4, 'days': 90},
+    'medium': {'family_members': 10, 'supplements': 6, 'days': 365},
+    'large': {'family_members': 50, 'supplements': 8, 'days': 730},
+    # Care-home sized household, close to a million intakes
+    'xlarge': {'family_members': 300, 'supplements': 10, 'days': 730},
+}
+
+# Probability that a scheduled dose was logged
+ADHERENCE = 0.8
+
+# Rows per bulk INSERT while generating intakes
+INSERT_BATCH = 20000
+
+
+def create_benchmark_app(db_path):
+    """Create the app on a fresh SQLite database"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    from main import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def generate_household(app, db, family_members, supplements, days, seed):
+    """Insert a synthetic household and return (user_id, family_member_ids, intake_count)"""
+    from utils.schedule import format_days
+
+    User = app.config['User']
+    FamilyMember = app.config['FamilyMember']
+    Supplement = app.config['Supplement']
+    Reminder = app.config['Reminder']
+    SupplementIntake = app.config['SupplementIntake']
+    rng = random.Random(seed)
+
+    user = User(name='Benchmark User', email=f'bench-{seed}@example.com', verified=True)
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.commit()
+
+    # Number the family members after the user, otherwise /compliance/<user id> resolves to
+    # the family member sharing that id and the user's own path is never measured
+    first_member_id = max(user.id, db.session.query(db.func.max(FamilyMember.id)).scalar() or 0) + 1
+    members = [
+        FamilyMember(
+            id=first_member_id + i, user_id=user.id, name=f'Member {i}',
+            email=f'bench-{seed}-{i}@example.com', status='accepted'
+        )
+        for i in range(family_members)
+    ]
+    db.session.add_all(members)
+    db.session.commit()
+
+    supplement_rows = [
+        Supplement(name=f'Supplement {i}', user_id=user.id, stock_level=1000)
+        for i in range(supplements)
+    ]
+    db.session.add_all(supplement_rows)
+    db.session.commit()
+
+    today = date.today()
+    first_day = today - timedelta(days=days - 1)
+    owners = [None] + [member.id for member in members]
+    reminders = []
+    for owner in owners:
+        for supplement in supplement_rows:
+            days_mask = rng.randint(1, 127)
+            reminders.append(Reminder(
+                supplement_id=supplement.id,
+                user_id=user.id,
+                family_member_id=owner,
+                time=dt_time(rng.randrange(6, 22), rng.choice([0, 15, 30, 45])),
+                days=format_days(days_mask),
+                days_mask=days_mask,
+                created_at=datetime.combine(first_day, dt_time(0, 0))
+            ))
+    db.session.add_all(reminders)
+    db.session.commit()
+
+    # Log intakes for scheduled doses with ADHERENCE probability
+    intake_table = SupplementIntake.__table__
+    batch = []
+    intake_count = 0
+    for reminder in reminders:
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            if not reminder.days_mask & (1 << day.weekday()) or rng.random() > ADHERENCE:
+                continue
+            taken_at = datetime.combine(day, reminder.time) + timedelta(minutes=rng.randrange(90))
+            batch.append({
+                'supplement_id': reminder.supplement_id,
+                'user_id': user.id,
+                'family_member_id': reminder.family_member_id,
+                'taken_at': taken_at,
+                # The benchmark user is on UTC
+                'local_date': taken_at.date(),
+                'dosage_taken': '1 tablet'
+            })
+            if len(batch) >= INSERT_BATCH:
+                db.session.execute(intake_table.insert(), batch)
+                intake_count += len(batch)
+                batch = []
+    if batch:
+        db.session.execute(intake_table.insert(), batch)
+        intake_count += len(batch)
+    db.session.commit()
+
+    return user.id, [member.id for member in members], intake_count
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def remove(self, engine):
+        from sqlalchemy import event
+        event.remove(engine, 'before_cursor_execute', self._on_execute)
+
+
+def benchmark_endpoints(user_id, family_member_ids, days):
+    """Endpoint name -> (method, url, json body) for one household"""
+    member_id = family_member_ids[0]
+    start_date = (date.today() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    end_date = date.today().strftime('%Y-%m-%d')
+    export_body = {'member_id': member_id, 'period': 'custom', 'start_date': start_date, 'end_date': end_date}
+    return {
+        'daily': ('GET', f'/compliance/daily/{member_id}', None),
+        'weekly': ('GET', f'/compliance/weekly/{member_id}', None),
+        'monthly': ('GET', f'/compliance/monthly/{member_id}', None),
+        'leaderboard': ('GET', '/compliance/leaderboard/0?period=monthly', None),
+        'export-json': ('POST', '/compliance/export-report', dict(export_body, format='json')),
+        'export-csv-stream': ('POST', '/compliance/export-report', dict(export_body, format='csv', stream=True)),
+        'missed-doses': ('GET', f'/compliance/missed-doses/{member_id}?days=90', None),
+        'trend': ('GET', f'/compliance/trend/{member_id}?days={min(days, 1000)}', None),
+        'bulk': ('POST', '/compliance/bulk', {'member_ids': family_member_ids[:500], 'periods': ['daily', 'weekly', 'monthly']}),
+        # The same reports for the user's own intakes (family_member_id IS NULL)
+        'daily-user': ('GET', f'/compliance/daily/{user_id}', None),
+        'weekly-user': ('GET', f'/compliance/weekly/{user_id}', None),
+        'monthly-user': ('GET', f'/compliance/monthly/{user_id}', None),
+        'missed-doses-user': ('GET', f'/compliance/missed-doses/{user_id}?days=90', None),
+    }
+
+
+def run_size(app, name, size, repeat, seed):
+    from flask_jwt_extended import create_access_token
+    from main import db
+
+    with app.app_context():
+        # Start every size from empty tables
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        user_id, family_member_ids, intake_count = generate_household(app, db, seed=seed, **size)
+        generate_seconds = time.perf_counter() - started
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+        counter = QueryCounter(db.engine)
+
+    print(f"\n== {name}: {len(family_member_ids) + 1} members, {size['supplements']} supplements, "
+          f"{size['days']} days, {intake_count} intakes (generated in {generate_seconds:.1f}s)")
+    print(f"{'endpoint':<20}{'median ms':>12}{'max ms':>12}{'queries':>10}")
+
+    client = app.test_client()
+    results = {}
+    for endpoint, (method, url, body) in benchmark_endpoints(user_id, family_member_ids, size['days']).items():
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            # Measure the uncached path every time
+            app.compliance_cache.clear()
+            counter.count = 0
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=body, headers=headers)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries = counter.count
+            if response.status_code != 200:
+                raise RuntimeError(f'{endpoint} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        results[endpoint] = {
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': queries
+        }
+        print(f"{endpoint:<20}{results[endpoint]['median_ms']:>12.2f}{results[endpoint]['max_ms']:>12.2f}{queries:>10}")
+
+    with app.app_context():
+        counter.remove(db.engine)
+
+    return {'size': size, 'intakes': intake_count, 'endpoints': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compliance endpoints on synthetic households")
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma-separated sizes: {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed requests per endpoint")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the data generator")
+    parser.add_argument("--json", help="Write results to this JSON file")
+
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_benchmark_app(os.path.join(tmp_dir, 'benchmark.db'))
+        report = {name: run_size(app, name, SIZES[name], args.repeat, args.seed) for name in sizes}
+        with app.app_context():
+            from main import db
+            db.engine.dispose()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
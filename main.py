@@ -7,11 +7,14 @@ import os
 from dotenv import load_dotenv
 from models.user import get_user_model
 from models.family_member import get_family_member_model
-from models.supplement import get_supplement_model, get_supplement_intake_model, get_reminder_model
+from models.supplement import get_supplement_model, get_supplement_intake_model, get_intake_deletion_model, get_reminder_model
 from models.subscription import get_subscription_model, get_subscription_product_model
 from models.rewards import get_reward_model, get_challenge_model, get_referral_model, get_reward_transaction_model
 from models.product import get_product_model
 from models.order import get_order_model
+from models.compliance import get_daily_compliance_model
+from models.export_job import get_export_job_model
+from models.upload_session import get_upload_session_model
 
 load_dotenv()  # Load .env file
 
@@ -33,6 +36,10 @@ Referral = None
 RewardTransaction = None
 Product = None
 Order = None
+DailyCompliance = None
+ExportJob = None
+UploadSession = None
+IntakeDeletion = None
 
 def create_app():
     app = Flask(__name__)
@@ -45,8 +52,13 @@ def create_app():
     # URL encode the password to handle special characters
     from urllib.parse import quote
     
+    # A full DATABASE_URL (e.g. sqlite:///bench.db for benchmarks) overrides the MySQL settings
+    database_url = os.getenv('DATABASE_URL')
+    
     # Handle host and port correctly
-    if ':' in db_host:
+    if database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    elif ':' in db_host:
         host_parts = db_host.split(':')
         db_host = host_parts[0]
         db_port = host_parts[1]
@@ -57,6 +69,32 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secure-secret-key')
     app.config['JWT_BLOCKLIST_ENABLED'] = True
     app.config['JWT_BLOCKLIST_TOKEN_CHECKS'] = ['access', 'refresh']
+    # Read compliance from the daily_compliance rollup (enable after running `flask rebuild-compliance-rollup`)
+    app.config['USE_COMPLIANCE_ROLLUP'] = os.getenv('USE_COMPLIANCE_ROLLUP', 'false').lower() == 'true'
+    # Asynchronous export jobs (artifacts default to <root>/exports)
+    app.config['EXPORT_JOBS_DIR'] = os.getenv('EXPORT_JOBS_DIR')
+    app.config['EXPORT_JOB_WORKERS'] = int(os.getenv('EXPORT_JOB_WORKERS', 2))
+    app.config['EXPORT_JOB_TTL'] = int(os.getenv('EXPORT_JOB_TTL', 24 * 60 * 60))
+    # Jobs still queued or running this long after submission were lost with their worker
+    app.config['EXPORT_JOB_TIMEOUT'] = int(os.getenv('EXPORT_JOB_TIMEOUT', 60 * 60))
+    # Upload storage: 'local' keeps blobs in UPLOADS_DIR (default <root>/uploads), 's3' keeps them in an
+    # S3-compatible bucket (requires boto3; S3_ENDPOINT_URL points it at MinIO and the like)
+    app.config['STORAGE_DRIVER'] = os.getenv('STORAGE_DRIVER', 'local')
+    app.config['UPLOADS_DIR'] = os.getenv('UPLOADS_DIR')
+    app.config['S3_BUCKET'] = os.getenv('S3_BUCKET')
+    app.config['S3_PREFIX'] = os.getenv('S3_PREFIX', '')
+    app.config['S3_ENDPOINT_URL'] = os.getenv('S3_ENDPOINT_URL')
+    app.config['S3_REGION'] = os.getenv('S3_REGION')
+    # UPLOADS_ACCEL_REDIRECT hands checked requests for local blobs to nginx (internal location prefix);
+    # USE_X_SENDFILE lets Apache/lighttpd send the file instead
+    app.config['UPLOADS_ACCEL_REDIRECT'] = os.getenv('UPLOADS_ACCEL_REDIRECT')
+    app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+    # Resumable photo uploads: chunks are staged in UPLOAD_SESSIONS_DIR (default <uploads>/.staging/sessions)
+    # and sessions idle for longer than UPLOAD_SESSION_TTL seconds are discarded
+    app.config['UPLOAD_SESSIONS_DIR'] = os.getenv('UPLOAD_SESSIONS_DIR')
+    app.config['UPLOAD_SESSION_TTL'] = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 60 * 60))
+    # Worker processes that strip metadata from uploaded images and make their resized variants
+    app.config['IMAGE_VARIANT_WORKERS'] = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
 
     # Initialize extensions
     db.init_app(app)
@@ -71,6 +109,7 @@ def create_app():
     from routes.subscription import subscription_bp
     from routes.rewards import rewards_bp
     from routes.admin import admin_bp
+    from routes.uploads import uploads_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(user_bp, url_prefix='/user')
     app.register_blueprint(supplements_bp, url_prefix='/supplements')
@@ -78,13 +117,23 @@ def create_app():
     app.register_blueprint(subscription_bp, url_prefix='/subscription')
     app.register_blueprint(rewards_bp, url_prefix='/rewards')
     app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(uploads_bp, url_prefix='/uploads')
+
+    # Register CLI commands
+    from utils.compliance_rollup import rebuild_compliance_rollup_command
+    app.cli.add_command(rebuild_compliance_rollup_command)
+    from utils.upload_reclaim import reclaim_uploads_command
+    app.cli.add_command(reclaim_uploads_command)
+    from utils.upload_sessions import purge_upload_sessions_command
+    app.cli.add_command(purge_upload_sessions_command)
 
     # Set up models
-    global User, FamilyMember, Supplement, SupplementIntake, Reminder, Subscription, SubscriptionProduct, Reward, Challenge, Referral, RewardTransaction, Product, Order
+    global User, FamilyMember, Supplement, SupplementIntake, Reminder, Subscription, SubscriptionProduct, Reward, Challenge, Referral, RewardTransaction, Product, Order, DailyCompliance, ExportJob, UploadSession, IntakeDeletion
     User = get_user_model(db)
     FamilyMember = get_family_member_model(db)
     Supplement = get_supplement_model(db)
     SupplementIntake = get_supplement_intake_model(db)
+    IntakeDeletion = get_intake_deletion_model(db)
     Reminder = get_reminder_model(db)
     Subscription = get_subscription_model(db)
     SubscriptionProduct = get_subscription_product_model(db)
@@ -94,11 +143,15 @@ def create_app():
     RewardTransaction = get_reward_transaction_model(db)
     Product = get_product_model(db)
     Order = get_order_model(db)
+    DailyCompliance = get_daily_compliance_model(db)
+    ExportJob = get_export_job_model(db)
+    UploadSession = get_upload_session_model(db)
     # Store models in app.config for access from routes
     app.config['User'] = User
     app.config['FamilyMember'] = FamilyMember
     app.config['Supplement'] = Supplement
     app.config['SupplementIntake'] = SupplementIntake
+    app.config['IntakeDeletion'] = IntakeDeletion
     app.config['Reminder'] = Reminder
     app.config['Subscription'] = Subscription
     app.config['SubscriptionProduct'] = SubscriptionProduct
@@ -108,6 +161,9 @@ def create_app():
     app.config['RewardTransaction'] = RewardTransaction
     app.config['Product'] = Product
     app.config['Order'] = Order
+    app.config['DailyCompliance'] = DailyCompliance
+    app.config['ExportJob'] = ExportJob
+    app.config['UploadSession'] = UploadSession
     with app.app_context():
         db.create_all()
         # Seed sample challenges if none exist
@@ -137,6 +193,22 @@ def create_app():
     # Initialize blocklist as a set
     app.blocklist = set()
 
+    # Upload storage driver
+    from utils.storage import create_storage, storage_settings
+    app.storage = create_storage(storage_settings(app))
+
+    # Per-user perceptual hash index of photo confirmations, for spotting reused photos; it is
+    # loaded from the database on the first lookup
+    from utils.photo_hash import PhotoHashIndex
+    app.photo_hash_index = PhotoHashIndex()
+
+    # In-process LRU cache for compliance responses
+    from utils.compliance_cache import ComplianceCache
+    app.compliance_cache = ComplianceCache(
+        max_entries=int(os.getenv('COMPLIANCE_CACHE_SIZE', 1024)),
+        ttl=int(os.getenv('COMPLIANCE_CACHE_TTL', 60))
+    )
+
     return app
 
 if __name__ == '__main__':
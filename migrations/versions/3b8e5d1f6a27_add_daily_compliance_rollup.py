@@ -0,0 +1,40 @@
+"""add daily compliance rollup
+
+Revision ID: 3b8e5d1f6a27
+Revises: 10c07b64dbf2
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e5d1f6a27'
+down_revision = '10c07b64dbf2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() in create_app may have made the table before this migration ran
+    if sa.inspect(op.get_bind()).has_table('daily_compliance'):
+        return
+    # Create daily_compliance rollup table (filled by `flask rebuild-compliance-rollup`)
+    op.create_table('daily_compliance',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('family_member_id', sa.Integer(), nullable=True),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('scheduled_doses', sa.Integer(), nullable=False),
+        sa.Column('taken_doses', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['family_member_id'], ['family_members.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'family_member_id', 'date', name='uq_daily_compliance_member_date')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_compliance')
@@ -0,0 +1,44 @@
+"""add export jobs
+
+Revision ID: 5c2a9e7d4b13
+Revises: 3b8e5d1f6a27
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2a9e7d4b13'
+down_revision = '3b8e5d1f6a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Skip when db.create_all() at app startup already made the table
+    if sa.inspect(op.get_bind()).has_table('export_jobs'):
+        return
+    # Create export_jobs table for asynchronous compliance exports
+    op.create_table('export_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('format', sa.String(length=10), nullable=False),
+        sa.Column('params', sa.Text(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('artifact_path', sa.String(length=255), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_export_jobs_expires_at', 'export_jobs', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_export_jobs_expires_at', table_name='export_jobs')
+    op.drop_table('export_jobs')
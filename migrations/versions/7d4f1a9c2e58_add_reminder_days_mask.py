@@ -0,0 +1,43 @@
+"""add weekday mask to reminders
+
+Revision ID: 7d4f1a9c2e58
+Revises: 5c2a9e7d4b13
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d4f1a9c2e58'
+down_revision = '5c2a9e7d4b13'
+branch_labels = None
+depends_on = None
+
+# Full and three-letter day names -> weekday bit (bit 0 = Monday)
+DAY_BITS = {}
+for weekday, name in enumerate(['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']):
+    DAY_BITS[name] = 1 << weekday
+    DAY_BITS[name[:3]] = 1 << weekday
+
+
+def upgrade():
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('days_mask', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_reminders_member_days', ['user_id', 'family_member_id', 'active', 'days_mask'], unique=False)
+
+    # Backfill the mask from the existing day strings
+    connection = op.get_bind()
+    reminders = sa.table('reminders', sa.column('id', sa.Integer), sa.column('days', sa.String), sa.column('days_mask', sa.Integer))
+    for reminder_id, days in connection.execute(sa.select(reminders.c.id, reminders.c.days)).fetchall():
+        mask = 0
+        for token in (days or '').split(','):
+            mask |= DAY_BITS.get(token.strip().lower(), 0)
+        connection.execute(reminders.update().where(reminders.c.id == reminder_id).values(days_mask=mask))
+
+
+def downgrade():
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.drop_index('ix_reminders_member_days')
+        batch_op.drop_column('days_mask')
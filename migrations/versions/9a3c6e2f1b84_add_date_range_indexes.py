@@ -0,0 +1,45 @@
+"""add composite indexes for date range queries
+
+Revision ID: 9a3c6e2f1b84
+Revises: 7d4f1a9c2e58
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3c6e2f1b84'
+down_revision = '7d4f1a9c2e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.create_index('ix_supplement_intakes_user_member_taken', ['user_id', 'family_member_id', 'taken_at'], unique=False)
+        batch_op.create_index('ix_supplement_intakes_member_taken', ['family_member_id', 'taken_at'], unique=False)
+        batch_op.create_index('ix_supplement_intakes_supplement_taken', ['supplement_id', 'taken_at'], unique=False)
+
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.create_index('ix_reminders_family_days', ['family_member_id', 'active', 'days_mask'], unique=False)
+
+    # A daily_compliance table made by db.create_all() already has the index
+    daily_compliance_indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('daily_compliance')}
+    if 'ix_daily_compliance_family_date' not in daily_compliance_indexes:
+        with op.batch_alter_table('daily_compliance', schema=None) as batch_op:
+            batch_op.create_index('ix_daily_compliance_family_date', ['family_member_id', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_compliance', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_compliance_family_date')
+
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.drop_index('ix_reminders_family_days')
+
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.drop_index('ix_supplement_intakes_supplement_taken')
+        batch_op.drop_index('ix_supplement_intakes_member_taken')
+        batch_op.drop_index('ix_supplement_intakes_user_member_taken')
@@ -0,0 +1,28 @@
+"""add perceptual photo hash to supplement intakes
+
+Revision ID: a1c7e3f9b5d2
+Revises: f4a6d8b2c0e3
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c7e3f9b5d2'
+down_revision = 'f4a6d8b2c0e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('photo_phash', sa.String(length=16), nullable=True))
+        batch_op.add_column(sa.Column('photo_reuse_of', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.drop_column('photo_reuse_of')
+        batch_op.drop_column('photo_phash')
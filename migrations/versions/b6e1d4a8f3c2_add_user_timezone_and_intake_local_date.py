@@ -0,0 +1,45 @@
+"""add user timezone and intake local date
+
+Revision ID: b6e1d4a8f3c2
+Revises: 9a3c6e2f1b84
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d4a8f3c2'
+down_revision = '9a3c6e2f1b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('timezone', sa.String(length=64), nullable=False, server_default='UTC'))
+
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('local_date', sa.Date(), nullable=True))
+
+    # Every existing user starts on UTC, so the local date is the UTC date of taken_at
+    intakes = sa.table('supplement_intakes', sa.column('taken_at', sa.DateTime), sa.column('local_date', sa.Date))
+    op.execute(intakes.update().values(
+        local_date=sa.func.coalesce(sa.func.date(intakes.c.taken_at), sa.func.current_date())
+    ))
+
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.alter_column('local_date', existing_type=sa.Date(), nullable=False)
+        batch_op.create_index('ix_supplement_intakes_user_member_local_date', ['user_id', 'family_member_id', 'local_date'], unique=False)
+        batch_op.create_index('ix_supplement_intakes_member_local_date', ['family_member_id', 'local_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.drop_index('ix_supplement_intakes_member_local_date')
+        batch_op.drop_index('ix_supplement_intakes_user_member_local_date')
+        batch_op.drop_column('local_date')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('timezone')
@@ -0,0 +1,57 @@
+"""key daily compliance rows by a non-null member key
+
+Revision ID: c3e5a7b9d1f4
+Revises: a1c7e3f9b5d2
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d1f4'
+down_revision = 'a1c7e3f9b5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A daily_compliance table made by db.create_all() is already keyed by member_key
+    if 'member_key' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('daily_compliance')}:
+        return
+    with op.batch_alter_table('daily_compliance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('member_key', sa.Integer(), nullable=False, server_default='0'))
+
+    connection = op.get_bind()
+    connection.execute(sa.text(
+        'UPDATE daily_compliance SET member_key = family_member_id WHERE family_member_id IS NOT NULL'
+    ))
+
+    # The old key did not cover the user's own rows (NULL family_member_id); fold any duplicate
+    # days into the oldest row before the new key is enforced
+    duplicates = connection.execute(sa.text(
+        'SELECT user_id, member_key, date, MIN(id), SUM(taken_doses) FROM daily_compliance '
+        'GROUP BY user_id, member_key, date HAVING COUNT(*) > 1'
+    )).fetchall()
+    for user_id, member_key, day, keep_id, taken_doses in duplicates:
+        connection.execute(sa.text(
+            'DELETE FROM daily_compliance WHERE user_id = :user_id AND member_key = :member_key '
+            'AND date = :day AND id != :keep_id'
+        ), {'user_id': user_id, 'member_key': member_key, 'day': day, 'keep_id': keep_id})
+        connection.execute(sa.text(
+            'UPDATE daily_compliance SET taken_doses = :taken_doses WHERE id = :keep_id'
+        ), {'taken_doses': taken_doses, 'keep_id': keep_id})
+
+    # Create the new key before dropping the old one: on MySQL the old unique index is the one
+    # backing the user_id foreign key and cannot be dropped until another index leads with user_id
+    with op.batch_alter_table('daily_compliance', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_daily_compliance_member_key_date', ['user_id', 'member_key', 'date'])
+        batch_op.drop_constraint('uq_daily_compliance_member_date', type_='unique')
+
+
+def downgrade():
+    with op.batch_alter_table('daily_compliance', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_daily_compliance_member_date', ['user_id', 'family_member_id', 'date'])
+        batch_op.drop_constraint('uq_daily_compliance_member_key_date', type_='unique')
+        batch_op.drop_column('member_key')
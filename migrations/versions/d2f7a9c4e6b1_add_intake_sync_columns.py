@@ -0,0 +1,38 @@
+"""add client id and updated_at to supplement intakes for offline sync
+
+Revision ID: d2f7a9c4e6b1
+Revises: b6e1d4a8f3c2
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c4e6b1'
+down_revision = 'b6e1d4a8f3c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_id', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing intakes were last changed when they were logged
+    intakes = sa.table('supplement_intakes', sa.column('taken_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+    op.execute(intakes.update().values(updated_at=intakes.c.taken_at))
+
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_supplement_intakes_user_client', ['user_id', 'client_id'])
+        batch_op.create_index('ix_supplement_intakes_user_updated', ['user_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.drop_index('ix_supplement_intakes_user_updated')
+        batch_op.drop_constraint('uq_supplement_intakes_user_client', type_='unique')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('client_id')
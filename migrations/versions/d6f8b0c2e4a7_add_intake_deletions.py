@@ -0,0 +1,41 @@
+"""add intake deletion tombstones
+
+Revision ID: d6f8b0c2e4a7
+Revises: c3e5a7b9d1f4
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f8b0c2e4a7'
+down_revision = 'c3e5a7b9d1f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app's db.create_all() makes the table as soon as the new code starts, which may be
+    # before this migration runs
+    if sa.inspect(op.get_bind()).has_table('intake_deletions'):
+        return
+    # Create intake_deletions table so /supplements/sync can report deleted intakes
+    op.create_table('intake_deletions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('intake_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.String(length=64), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_intake_deletions_user_id', 'intake_deletions', ['user_id', 'id'], unique=False)
+    op.create_index('ix_intake_deletions_user_client', 'intake_deletions', ['user_id', 'client_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_intake_deletions_user_client', table_name='intake_deletions')
+    op.drop_index('ix_intake_deletions_user_id', table_name='intake_deletions')
+    op.drop_table('intake_deletions')
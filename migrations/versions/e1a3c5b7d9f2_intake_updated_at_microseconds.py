@@ -0,0 +1,37 @@
+"""store supplement intake updated_at with microseconds on MySQL
+
+Revision ID: e1a3c5b7d9f2
+Revises: d6f8b0c2e4a7
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a3c5b7d9f2'
+down_revision = 'd6f8b0c2e4a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Other databases already keep fractional seconds in DATETIME/TIMESTAMP columns
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+               existing_type=mysql.DATETIME(),
+               type_=mysql.DATETIME(fsp=6),
+               existing_nullable=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+               existing_type=mysql.DATETIME(fsp=6),
+               type_=mysql.DATETIME(),
+               existing_nullable=True)
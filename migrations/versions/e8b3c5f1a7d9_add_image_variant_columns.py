@@ -0,0 +1,36 @@
+"""add resized image variant columns to supplements and supplement intakes
+
+Revision ID: e8b3c5f1a7d9
+Revises: d2f7a9c4e6b1
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3c5f1a7d9'
+down_revision = 'd2f7a9c4e6b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('supplements', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_thumb_url', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('image_medium_url', sa.String(length=255), nullable=True))
+
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('photo_thumb', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('photo_medium', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.drop_column('photo_medium')
+        batch_op.drop_column('photo_thumb')
+
+    with op.batch_alter_table('supplements', schema=None) as batch_op:
+        batch_op.drop_column('image_medium_url')
+        batch_op.drop_column('image_thumb_url')
@@ -0,0 +1,42 @@
+"""add upload sessions
+
+Revision ID: f4a6d8b2c0e3
+Revises: e8b3c5f1a7d9
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a6d8b2c0e3'
+down_revision = 'e8b3c5f1a7d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Skip when db.create_all() at app startup already made the table
+    if sa.inspect(op.get_bind()).has_table('upload_sessions'):
+        return
+    # Create upload_sessions table for resumable photo confirmation uploads
+    op.create_table('upload_sessions',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('intake_id', sa.Integer(), nullable=False),
+        sa.Column('extension', sa.String(length=10), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('received', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['intake_id'], ['supplement_intakes.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_sessions_expires_at', 'upload_sessions', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_upload_sessions_expires_at', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
@@ -0,0 +1,32 @@
+"""index image references so uploaded originals can be deleted once unused
+
+Revision ID: f7b9d1e3a5c8
+Revises: e1a3c5b7d9f2
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b9d1e3a5c8'
+down_revision = 'e1a3c5b7d9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('supplements', schema=None) as batch_op:
+        batch_op.create_index('ix_supplements_image_url', ['image_url'], unique=False)
+
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.create_index('ix_supplement_intakes_photo_confirmation', ['photo_confirmation'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('supplement_intakes', schema=None) as batch_op:
+        batch_op.drop_index('ix_supplement_intakes_photo_confirmation')
+
+    with op.batch_alter_table('supplements', schema=None) as batch_op:
+        batch_op.drop_index('ix_supplements_image_url')
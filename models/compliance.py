@@ -0,0 +1,24 @@
+from datetime import datetime
+
+def get_daily_compliance_model(db):
+    class DailyCompliance(db.Model):
+        __tablename__ = 'daily_compliance'
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+        family_member_id = db.Column(db.Integer, db.ForeignKey('family_members.id'), nullable=True)
+        # family_member_id, or 0 for the user's own rows, so the unique key has no NULLs
+        member_key = db.Column(db.Integer, default=0, nullable=False)
+        date = db.Column(db.Date, nullable=False)
+        scheduled_doses = db.Column(db.Integer, default=0, nullable=False)
+        taken_doses = db.Column(db.Integer, default=0, nullable=False)
+        updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+        __table_args__ = (
+            db.UniqueConstraint('user_id', 'member_key', 'date', name='uq_daily_compliance_member_key_date'),
+            db.Index('ix_daily_compliance_family_date', 'family_member_id', 'date'),
+        )
+
+    return DailyCompliance
+
+# This will be set by main.py or another initialization point
+DailyCompliance = None
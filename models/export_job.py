@@ -0,0 +1,21 @@
+from datetime import datetime
+
+def get_export_job_model(db):
+    class ExportJob(db.Model):
+        __tablename__ = 'export_jobs'
+        id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+        status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, finished, failed
+        format = db.Column(db.String(10), nullable=False)
+        params = db.Column(db.Text, nullable=False)  # JSON encoded report parameters
+        filename = db.Column(db.String(255), nullable=True)
+        artifact_path = db.Column(db.String(255), nullable=True)
+        error = db.Column(db.Text, nullable=True)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        finished_at = db.Column(db.DateTime, nullable=True)
+        expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    return ExportJob
+
+# This will be set by main.py or another initialization point
+ExportJob = None
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.dialects import mysql
 
 def get_supplement_model(db):
     class Supplement(db.Model):
@@ -9,7 +10,9 @@ def get_supplement_model(db):
         dosage = db.Column(db.String(50), nullable=True)
         stock_level = db.Column(db.Integer, default=0)
         low_stock_threshold = db.Column(db.Integer, default=5)
-        image_url = db.Column(db.String(255), nullable=True)
+        image_url = db.Column(db.String(255), nullable=True, index=True)
+        image_thumb_url = db.Column(db.String(255), nullable=True)  # Resized WebP variants of image_url
+        image_medium_url = db.Column(db.String(255), nullable=True)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
         
@@ -26,15 +29,58 @@ def get_supplement_intake_model(db):
         user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
         family_member_id = db.Column(db.Integer, db.ForeignKey('family_members.id'), nullable=True)
         taken_at = db.Column(db.DateTime, default=datetime.utcnow)
+        local_date = db.Column(db.Date, nullable=False)  # taken_at's date in the owner's timezone
         dosage_taken = db.Column(db.String(50), nullable=True)
         notes = db.Column(db.Text, nullable=True)
         photo_confirmation = db.Column(db.String(255), nullable=True)  # Path to photo
+        photo_thumb = db.Column(db.String(255), nullable=True)  # Resized WebP variants of photo_confirmation
+        photo_medium = db.Column(db.String(255), nullable=True)
+        photo_phash = db.Column(db.String(16), nullable=True)  # Perceptual hash of the photo (64-bit dHash, hex)
+        photo_reuse_of = db.Column(db.Integer, nullable=True)  # Earlier intake whose photo looks the same
+        client_id = db.Column(db.String(64), nullable=True)  # Id generated by an offline client
+        # Microseconds on MySQL too (DATETIME defaults to whole seconds); /supplements/sync pages by it
+        updated_at = db.Column(
+            db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+            default=datetime.utcnow, onupdate=datetime.utcnow
+        )
+        
+        __table_args__ = (
+            db.UniqueConstraint('user_id', 'client_id', name='uq_supplement_intakes_user_client'),
+            db.Index('ix_supplement_intakes_user_updated', 'user_id', 'updated_at', 'id'),
+            db.Index('ix_supplement_intakes_user_member_taken', 'user_id', 'family_member_id', 'taken_at'),
+            db.Index('ix_supplement_intakes_member_taken', 'family_member_id', 'taken_at'),
+            db.Index('ix_supplement_intakes_supplement_taken', 'supplement_id', 'taken_at'),
+            db.Index('ix_supplement_intakes_user_member_local_date', 'user_id', 'family_member_id', 'local_date'),
+            db.Index('ix_supplement_intakes_member_local_date', 'family_member_id', 'local_date'),
+            # Lets the image pipeline check whether an uploaded original is still referenced
+            db.Index('ix_supplement_intakes_photo_confirmation', 'photo_confirmation'),
+        )
         
     return SupplementIntake
 
 # This will be set by main.py or another initialization point
 SupplementIntake = None
 
+def get_intake_deletion_model(db):
+    class IntakeDeletion(db.Model):
+        # Tombstone of a deleted intake, reported to offline clients by /supplements/sync
+        __tablename__ = 'intake_deletions'
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+        intake_id = db.Column(db.Integer, nullable=False)  # No foreign key: the intake row is gone
+        client_id = db.Column(db.String(64), nullable=True)
+        deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+        
+        __table_args__ = (
+            db.Index('ix_intake_deletions_user_id', 'user_id', 'id'),
+            db.Index('ix_intake_deletions_user_client', 'user_id', 'client_id'),
+        )
+        
+    return IntakeDeletion
+
+# This will be set by main.py or another initialization point
+IntakeDeletion = None
+
 def get_reminder_model(db):
     class Reminder(db.Model):
         __tablename__ = 'reminders'
@@ -44,9 +90,15 @@ def get_reminder_model(db):
         family_member_id = db.Column(db.Integer, db.ForeignKey('family_members.id'), nullable=True)
         time = db.Column(db.Time, nullable=False)
         days = db.Column(db.String(50), nullable=False)  # e.g., 'Mon,Tue,Wed'
+        days_mask = db.Column(db.Integer, nullable=False, default=0)  # bit 0 = Monday ... bit 6 = Sunday
         active = db.Column(db.Boolean, default=True)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         
+        __table_args__ = (
+            db.Index('ix_reminders_member_days', 'user_id', 'family_member_id', 'active', 'days_mask'),
+            db.Index('ix_reminders_family_days', 'family_member_id', 'active', 'days_mask'),
+        )
+        
     return Reminder
 
 # This will be set by main.py or another initialization point
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+def get_upload_session_model(db):
+    class UploadSession(db.Model):
+        __tablename__ = 'upload_sessions'
+        id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+        intake_id = db.Column(db.Integer, db.ForeignKey('supplement_intakes.id'), nullable=False)
+        extension = db.Column(db.String(10), nullable=False)
+        size = db.Column(db.Integer, nullable=False)  # Declared total size in bytes
+        received = db.Column(db.Integer, default=0, nullable=False)  # Bytes written contiguously from the start
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Pushed back by every chunk
+
+    return UploadSession
+
+# This will be set by main.py or another initialization point
+UploadSession = None
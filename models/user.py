@@ -12,6 +12,7 @@ def get_user_model(db):
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         verified = db.Column(db.Boolean, default=False)
         role = db.Column(db.String(50), default='user', nullable=False)
+        timezone = db.Column(db.String(64), default='UTC', nullable=False)  # IANA name, e.g. 'Asia/Karachi'
 
         def set_password(self, password):
             self.password_hash = generate_password_hash(password)
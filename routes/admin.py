@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime
 from sqlalchemy import desc, asc
+from utils.stock import decrement_stock, increment_stock
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -129,11 +130,27 @@ def update_product():
         except (ValueError, TypeError):
             return jsonify({'error': 'Stock must be a valid integer', 'code': 'INVALID_STOCK'}), 400
     
+    # Relative stock changes (restocks, fulfilled orders) are applied atomically in SQL
+    stock_delta = None
+    if 'stock_delta' in data:
+        if 'stock' in data:
+            return jsonify({'error': 'Send either stock or stock_delta, not both', 'code': 'INVALID_STOCK_DELTA'}), 400
+        try:
+            stock_delta = int(data['stock_delta'])
+            updated_fields.append('stock')
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Stock delta must be a valid integer', 'code': 'INVALID_STOCK_DELTA'}), 400
+    
     if not updated_fields:
         return jsonify({'error': 'No valid fields to update', 'code': 'NO_UPDATES'}), 400
     
     try:
         from main import db
+        if stock_delta:
+            if stock_delta > 0:
+                increment_stock(Product.stock, product.id, stock_delta)
+            else:
+                decrement_stock(Product.stock, product.id, -stock_delta)
         db.session.commit()
         return jsonify({
             'message': 'Product updated successfully',
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from marshmallow import Schema, fields, ValidationError
 from werkzeug.security import check_password_hash
+from utils.timezones import DEFAULT_TIMEZONE, is_valid_timezone
 
 auth_bp = Blueprint('auth', __name__)  # Define blueprint at the top
 
@@ -11,6 +12,7 @@ class UserSchema(Schema):
     name = fields.Str(required=True)
     email = fields.Email(required=True)
     password = fields.Str(required=True, validate=lambda n: len(n) >= 6)
+    timezone = fields.Str(load_default=DEFAULT_TIMEZONE, validate=is_valid_timezone)
 
 class LoginSchema(Schema):
     email = fields.Email(required=True)
@@ -30,7 +32,7 @@ def signup():
         if User.query.filter_by(email=data['email']).first():
             return jsonify({'error': 'Email already registered'}), 400
 
-        user = User(name=data['name'], email=data['email'])
+        user = User(name=data['name'], email=data['email'], timezone=data['timezone'])
         user.set_password(data['password'])
         
         db.session.add(user)
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, request, jsonify, current_app, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from main import db
 from datetime import datetime, date, timedelta
@@ -6,56 +6,96 @@ import os
 import csv
 import io
 import json
+import zlib
 from sqlalchemy import func, and_, or_
+from utils.schedule import WeeklySchedule, due_on
+from utils.compliance_rollup import rollup_enabled
+from utils.compliance_cache import member_scope, household_scope, cache_key
+from utils.export_jobs import submit_export_job, clean_up_jobs
+from utils.timezones import user_today
+from utils import trends
+import numpy as np
 
 compliance_bp = Blueprint('compliance', __name__)
 
+# Largest page size accepted by the missed doses endpoint
+MAX_MISSED_DOSES_PAGE = 500
+
+# Number of days computed per intake query when streaming an export
+EXPORT_CHUNK_DAYS = 31
+
+# Most members accepted by one bulk compliance request
+MAX_BULK_MEMBERS = 500
+
+# Longest range and rolling window accepted by the trend endpoint
+MAX_TREND_DAYS = 1000
+MAX_TREND_WINDOW = 365
+
 # Helper function to calculate compliance rate
 def calculate_compliance_rate(scheduled_doses, taken_doses):
     if scheduled_doses == 0:
         return 0
     return (taken_doses / scheduled_doses) * 100
 
-# Helper function to get scheduled doses for a member
-def get_scheduled_doses(member_id, start_date, end_date, is_family_member=False):
+# Helper function to build the weekly dose schedule for a member
+def get_member_schedule(member_id, is_family_member=False):
     Reminder = current_app.config.get('Reminder')
     
-    # Get all active reminders for the member
-    query = Reminder.query.filter(Reminder.active == True)
+    # Count active reminders per weekday mask for the member
+    query = db.session.query(Reminder.days_mask, func.count(Reminder.id)).filter(Reminder.active == True)
     
     if is_family_member:
         query = query.filter(Reminder.family_member_id == member_id)
     else:
         query = query.filter(Reminder.user_id == member_id, Reminder.family_member_id == None)
     
-    reminders = query.all()
+    schedule = WeeklySchedule()
+    for days_mask, count in query.group_by(Reminder.days_mask).all():
+        schedule.add_mask(days_mask, count)
+    return schedule
+
+# Helper function to get the daily, weekly (Monday to Sunday) or monthly range containing a date
+def get_period_range(period, anchor_date):
+    if period == 'daily':
+        return anchor_date, anchor_date
+    if period == 'weekly':
+        start_date = anchor_date - timedelta(days=anchor_date.weekday())
+        return start_date, start_date + timedelta(days=6)
+    # monthly
+    start_date = date(anchor_date.year, anchor_date.month, 1)
+    if anchor_date.month == 12:
+        end_date = date(anchor_date.year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end_date = date(anchor_date.year, anchor_date.month + 1, 1) - timedelta(days=1)
+    return start_date, end_date
+
+# Helper function to get scheduled doses for a member
+def get_scheduled_doses(member_id, start_date, end_date, is_family_member=False):
+    if start_date != end_date:
+        return get_member_schedule(member_id, is_family_member).count(start_date, end_date)
     
-    # Calculate scheduled doses based on reminder days and date range
-    scheduled_count = 0
-    current_date = start_date
+    # A single day is counted in SQL with the weekday mask predicate
+    Reminder = current_app.config.get('Reminder')
+    query = Reminder.query.filter(Reminder.active == True, due_on(Reminder.days_mask, start_date))
     
-    while current_date <= end_date:
-        day_name = current_date.strftime('%A')
-        for reminder in reminders:
-            # Check if this day is scheduled in the reminder
-            if day_name in reminder.days.split(','):
-                scheduled_count += 1
-        current_date += timedelta(days=1)
+    if is_family_member:
+        query = query.filter(Reminder.family_member_id == member_id)
+    else:
+        query = query.filter(Reminder.user_id == member_id, Reminder.family_member_id == None)
     
-    return scheduled_count
+    return query.count()
 
 # Helper function to get taken doses for a member
 def get_taken_doses(member_id, start_date, end_date, is_family_member=False):
-    SupplementIntake = current_app.config.get('SupplementIntake')
+    if rollup_enabled():
+        return sum(get_daily_taken_doses(member_id, start_date, end_date, is_family_member).values())
     
-    # Convert dates to datetime for comparison
-    start_datetime = datetime.combine(start_date, datetime.min.time())
-    end_datetime = datetime.combine(end_date, datetime.max.time())
+    SupplementIntake = current_app.config.get('SupplementIntake')
     
-    # Query intakes within the date range
+    # Query intakes within the date range (local dates, inclusive)
     query = SupplementIntake.query.filter(
-        SupplementIntake.taken_at >= start_datetime,
-        SupplementIntake.taken_at <= end_datetime
+        SupplementIntake.local_date >= start_date,
+        SupplementIntake.local_date <= end_date
     )
     
     if is_family_member:
@@ -65,6 +105,179 @@ def get_taken_doses(member_id, start_date, end_date, is_family_member=False):
     
     return query.count()
 
+# Helper function to get taken doses per day for a member in a single grouped query
+def get_daily_taken_doses(member_id, start_date, end_date, is_family_member=False):
+    if rollup_enabled():
+        return get_rollup_taken_doses(member_id, start_date, end_date, is_family_member)
+    
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    
+    query = db.session.query(SupplementIntake.local_date, func.count(SupplementIntake.id)).filter(
+        SupplementIntake.local_date >= start_date,
+        SupplementIntake.local_date <= end_date
+    )
+    
+    if is_family_member:
+        query = query.filter(SupplementIntake.family_member_id == member_id)
+    else:
+        query = query.filter(SupplementIntake.user_id == member_id, SupplementIntake.family_member_id == None)
+    
+    return dict(query.group_by(SupplementIntake.local_date).all())
+
+# Helper function to read per-day taken doses for a member from the daily_compliance rollup
+def get_rollup_taken_doses(member_id, start_date, end_date, is_family_member=False):
+    DailyCompliance = current_app.config.get('DailyCompliance')
+    
+    query = db.session.query(DailyCompliance.date, DailyCompliance.taken_doses).filter(
+        DailyCompliance.date >= start_date,
+        DailyCompliance.date <= end_date,
+        DailyCompliance.taken_doses > 0
+    )
+    
+    if is_family_member:
+        query = query.filter(DailyCompliance.family_member_id == member_id)
+    else:
+        query = query.filter(DailyCompliance.user_id == member_id, DailyCompliance.member_key == 0)
+    
+    return dict(query.all())
+
+# Helper function to sum per-day taken doses over a date range (inclusive)
+def sum_taken_doses(taken_by_date, start_date, end_date):
+    return sum(count for day, count in taken_by_date.items() if start_date <= day <= end_date)
+
+# Helper function to build a filter matching rows of a user (family_member_id NULL) and/or the
+# given family members; family_member_ids may be a list or a subquery
+def household_filter(model, user_id, family_member_ids, include_user=True):
+    clauses = [model.family_member_id.in_(family_member_ids)]
+    if include_user:
+        clauses.append(and_(model.user_id == user_id, model.family_member_id == None))
+    return or_(*clauses)
+
+# Helper function to build weekly schedules for several household members with one grouped
+# query. Schedules are keyed by family_member_id, with None for the user.
+def get_household_schedules(user_id, family_member_ids, include_user=True):
+    Reminder = current_app.config.get('Reminder')
+    
+    reminder_rows = db.session.query(
+        Reminder.family_member_id, Reminder.days_mask, func.count(Reminder.id)
+    ).filter(
+        Reminder.active == True,
+        household_filter(Reminder, user_id, family_member_ids, include_user)
+    ).group_by(Reminder.family_member_id, Reminder.days_mask).all()
+    
+    schedules = {}
+    for family_member_id, days_mask, count in reminder_rows:
+        schedule = schedules.setdefault(family_member_id, WeeklySchedule())
+        schedule.add_mask(days_mask, count)
+    return schedules
+
+# Helper function to get per-day taken doses for several household members with one grouped
+# query. Returns {family_member_id (None for the user): {date: count}}.
+def get_household_daily_taken_doses(user_id, family_member_ids, start_date, end_date, include_user=True):
+    if rollup_enabled():
+        DailyCompliance = current_app.config.get('DailyCompliance')
+        rows = db.session.query(
+            DailyCompliance.family_member_id, DailyCompliance.date, DailyCompliance.taken_doses
+        ).filter(
+            DailyCompliance.date >= start_date,
+            DailyCompliance.date <= end_date,
+            DailyCompliance.taken_doses > 0,
+            household_filter(DailyCompliance, user_id, family_member_ids, include_user)
+        ).all()
+    else:
+        SupplementIntake = current_app.config.get('SupplementIntake')
+        rows = db.session.query(
+            SupplementIntake.family_member_id, SupplementIntake.local_date, func.count(SupplementIntake.id)
+        ).filter(
+            SupplementIntake.local_date >= start_date,
+            SupplementIntake.local_date <= end_date,
+            household_filter(SupplementIntake, user_id, family_member_ids, include_user)
+        ).group_by(SupplementIntake.family_member_id, SupplementIntake.local_date).all()
+    
+    taken = {}
+    for family_member_id, day, count in rows:
+        taken.setdefault(family_member_id, {})[day] = count
+    return taken
+
+# Helper function to rank a user and their family members by compliance over a date range.
+# Reminders and intakes for the whole household are each loaded with one grouped query,
+# so the cost does not grow with the number of family members.
+def get_household_leaderboard(user, family_members, start_date, end_date):
+    FamilyMember = current_app.config.get('FamilyMember')
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    
+    household_ids = db.session.query(FamilyMember.id).filter(FamilyMember.user_id == user.id)
+    
+    # Scheduled doses: reminders grouped by family member and weekday mask
+    schedules = get_household_schedules(user.id, household_ids)
+    
+    # Taken doses: intakes (or rollup rows) in the range grouped by family member
+    if rollup_enabled():
+        DailyCompliance = current_app.config.get('DailyCompliance')
+        intake_rows = db.session.query(
+            DailyCompliance.family_member_id, func.sum(DailyCompliance.taken_doses)
+        ).filter(
+            DailyCompliance.date >= start_date,
+            DailyCompliance.date <= end_date,
+            household_filter(DailyCompliance, user.id, household_ids)
+        ).group_by(DailyCompliance.family_member_id).all()
+    else:
+        intake_rows = db.session.query(
+            SupplementIntake.family_member_id, func.count(SupplementIntake.id)
+        ).filter(
+            SupplementIntake.local_date >= start_date,
+            SupplementIntake.local_date <= end_date,
+            household_filter(SupplementIntake, user.id, household_ids)
+        ).group_by(SupplementIntake.family_member_id).all()
+    taken = {family_member_id: int(count or 0) for family_member_id, count in intake_rows}
+    
+    # The user is keyed by None (no family member); family members by their id
+    entries = [(None, user.id, user.name, True)]
+    entries.extend((member.id, member.id, member.name, False) for member in family_members)
+    
+    leaderboard = []
+    for key, member_id, member_name, is_user in entries:
+        schedule = schedules.get(key)
+        member_scheduled = schedule.count(start_date, end_date) if schedule else 0
+        member_taken = taken.get(key, 0)
+        member_rate = calculate_compliance_rate(member_scheduled, member_taken)
+        
+        leaderboard.append({
+            'member_id': member_id,
+            'member_name': member_name,
+            'is_user': is_user,
+            'scheduled_doses': member_scheduled,
+            'taken_doses': member_taken,
+            'compliance_rate': round(member_rate, 2)
+        })
+    
+    # Sort leaderboard by compliance rate (descending)
+    leaderboard.sort(key=lambda x: x['compliance_rate'], reverse=True)
+    
+    # Add rank to each entry
+    for i, entry in enumerate(leaderboard):
+        entry['rank'] = i + 1
+    
+    return leaderboard
+
+# Helper function to lazily yield scheduled (date, reminder) slots, most recent date first.
+# If `after` is a (date, reminder_id) cursor, slots up to and including it are skipped.
+def iter_scheduled_slots(reminders, start_date, end_date, after=None):
+    masks = [(reminder, reminder.days_mask) for reminder in reminders]
+    current_date = end_date
+    if after and after[0] < current_date:
+        current_date = after[0]
+    
+    while current_date >= start_date:
+        weekday_bit = 1 << current_date.weekday()
+        for reminder, mask in masks:
+            if not mask & weekday_bit:
+                continue
+            if after and current_date == after[0] and reminder.id <= after[1]:
+                continue
+            yield current_date, reminder
+        current_date -= timedelta(days=1)
+
 # Get daily compliance for a member
 @compliance_bp.route('/daily/<int:member_id>', methods=['GET'])
 @jwt_required()
@@ -92,7 +305,8 @@ def daily_compliance(member_id):
     if not member:
         return jsonify({'error': 'Member not found'}), 404
     
-    # Get date parameter or use today
+    # Get date parameter or use today in the user's timezone
+    today = user_today(current_user)
     date_str = request.args.get('date')
     if date_str:
         try:
@@ -100,21 +314,31 @@ def daily_compliance(member_id):
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     else:
-        target_date = date.today()
+        target_date = today
+    
+    # Serve from the compliance cache when possible
+    cache = current_app.compliance_cache
+    key = cache_key(member_scope(member_id, is_family_member), 'daily', target_date, target_date)
+    cached = cache.get(key)
+    if cached is not None:
+        return jsonify(cached), 200
     
     # Calculate compliance for the day
     scheduled_doses = get_scheduled_doses(member_id, target_date, target_date, is_family_member)
     taken_doses = get_taken_doses(member_id, target_date, target_date, is_family_member)
     compliance_rate = calculate_compliance_rate(scheduled_doses, taken_doses)
     
-    return jsonify({
+    result = {
         'date': target_date.strftime('%Y-%m-%d'),
         'member_id': member_id,
-        'member_name': family_member.name if is_family_member else member.username,
+        'member_name': family_member.name if is_family_member else member.name,
         'scheduled_doses': scheduled_doses,
         'taken_doses': taken_doses,
         'compliance_rate': round(compliance_rate, 2)
-    }), 200
+    }
+    cache.set(key, result)
+    
+    return jsonify(result), 200
 
 # Get weekly compliance for a member
 @compliance_bp.route('/weekly/<int:member_id>', methods=['GET'])
@@ -143,7 +367,8 @@ def weekly_compliance(member_id):
     if not member:
         return jsonify({'error': 'Member not found'}), 404
     
-    # Get week parameter or use current week
+    # Get week parameter or use current week in the user's timezone
+    today = user_today(current_user)
     date_str = request.args.get('date')
     if date_str:
         try:
@@ -151,23 +376,31 @@ def weekly_compliance(member_id):
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     else:
-        target_date = date.today()
+        target_date = today
     
     # Calculate start and end of week (Monday to Sunday)
     start_of_week = target_date - timedelta(days=target_date.weekday())
     end_of_week = start_of_week + timedelta(days=6)
     
+    # Serve from the compliance cache when possible
+    cache = current_app.compliance_cache
+    key = cache_key(member_scope(member_id, is_family_member), 'weekly', start_of_week, end_of_week)
+    cached = cache.get(key)
+    if cached is not None:
+        return jsonify(cached), 200
+    
     # Calculate compliance for the week
-    scheduled_doses = get_scheduled_doses(member_id, start_of_week, end_of_week, is_family_member)
-    taken_doses = get_taken_doses(member_id, start_of_week, end_of_week, is_family_member)
+    schedule = get_member_schedule(member_id, is_family_member)
+    scheduled_doses = schedule.count(start_of_week, end_of_week)
+    taken_by_date = get_daily_taken_doses(member_id, start_of_week, end_of_week, is_family_member)
+    taken_doses = sum(taken_by_date.values())
     compliance_rate = calculate_compliance_rate(scheduled_doses, taken_doses)
     
     # Get daily breakdown
     daily_data = []
     current_date = start_of_week
-    while current_date <= end_of_week:
-        day_scheduled = get_scheduled_doses(member_id, current_date, current_date, is_family_member)
-        day_taken = get_taken_doses(member_id, current_date, current_date, is_family_member)
+    for day_scheduled in schedule.daily(start_of_week, end_of_week):
+        day_taken = taken_by_date.get(current_date, 0)
         day_rate = calculate_compliance_rate(day_scheduled, day_taken)
         
         daily_data.append({
@@ -180,16 +413,19 @@ def weekly_compliance(member_id):
         
         current_date += timedelta(days=1)
     
-    return jsonify({
+    result = {
         'week_start': start_of_week.strftime('%Y-%m-%d'),
         'week_end': end_of_week.strftime('%Y-%m-%d'),
         'member_id': member_id,
-        'member_name': family_member.name if is_family_member else member.username,
+        'member_name': family_member.name if is_family_member else member.name,
         'scheduled_doses': scheduled_doses,
         'taken_doses': taken_doses,
         'compliance_rate': round(compliance_rate, 2),
         'daily_breakdown': daily_data
-    }), 200
+    }
+    cache.set(key, result)
+    
+    return jsonify(result), 200
 
 # Get monthly compliance for a member
 @compliance_bp.route('/monthly/<int:member_id>', methods=['GET'])
@@ -218,7 +454,8 @@ def monthly_compliance(member_id):
     if not member:
         return jsonify({'error': 'Member not found'}), 404
     
-    # Get month parameter or use current month
+    # Get month parameter or use current month in the user's timezone
+    today = user_today(current_user)
     month_str = request.args.get('month')
     year_str = request.args.get('year')
     
@@ -233,7 +470,6 @@ def monthly_compliance(member_id):
         except ValueError:
             return jsonify({'error': 'Invalid month or year format'}), 400
     else:
-        today = date.today()
         start_of_month = date(today.year, today.month, 1)
     
     # Calculate the last day of the month
@@ -242,9 +478,18 @@ def monthly_compliance(member_id):
     else:
         end_of_month = date(start_of_month.year, start_of_month.month + 1, 1) - timedelta(days=1)
     
+    # Serve from the compliance cache when possible
+    cache = current_app.compliance_cache
+    key = cache_key(member_scope(member_id, is_family_member), 'monthly', start_of_month, end_of_month)
+    cached = cache.get(key)
+    if cached is not None:
+        return jsonify(cached), 200
+    
     # Calculate compliance for the month
-    scheduled_doses = get_scheduled_doses(member_id, start_of_month, end_of_month, is_family_member)
-    taken_doses = get_taken_doses(member_id, start_of_month, end_of_month, is_family_member)
+    schedule = get_member_schedule(member_id, is_family_member)
+    scheduled_doses = schedule.count(start_of_month, end_of_month)
+    taken_by_date = get_daily_taken_doses(member_id, start_of_month, end_of_month, is_family_member)
+    taken_doses = sum(taken_by_date.values())
     compliance_rate = calculate_compliance_rate(scheduled_doses, taken_doses)
     
     # Get weekly breakdown
@@ -261,8 +506,8 @@ def monthly_compliance(member_id):
         if week_end > end_of_month:
             week_end = end_of_month
         
-        week_scheduled = get_scheduled_doses(member_id, week_start, week_end, is_family_member)
-        week_taken = get_taken_doses(member_id, week_start, week_end, is_family_member)
+        week_scheduled = schedule.count(week_start, week_end)
+        week_taken = sum_taken_doses(taken_by_date, week_start, week_end)
         week_rate = calculate_compliance_rate(week_scheduled, week_taken)
         
         weekly_data.append({
@@ -278,16 +523,219 @@ def monthly_compliance(member_id):
         if current_date > end_of_month:
             break
     
-    return jsonify({
+    result = {
         'month': start_of_month.strftime('%B %Y'),
         'month_start': start_of_month.strftime('%Y-%m-%d'),
         'month_end': end_of_month.strftime('%Y-%m-%d'),
         'member_id': member_id,
-        'member_name': family_member.name if is_family_member else member.username,
+        'member_name': family_member.name if is_family_member else member.name,
         'scheduled_doses': scheduled_doses,
         'taken_doses': taken_doses,
         'compliance_rate': round(compliance_rate, 2),
         'weekly_breakdown': weekly_data
+    }
+    cache.set(key, result)
+    
+    return jsonify(result), 200
+
+# Get long-range compliance trend for a member
+@compliance_bp.route('/trend/<int:member_id>', methods=['GET'])
+@jwt_required()
+def compliance_trend(member_id):
+    current_user = int(get_jwt_identity())
+    User = current_app.config.get('User')
+    FamilyMember = current_app.config.get('FamilyMember')
+    
+    # Check if the member_id is for a family member or the user
+    is_family_member = False
+    member = None
+    
+    # First check if it's a family member
+    family_member = FamilyMember.query.filter_by(id=member_id, user_id=current_user).first()
+    if family_member:
+        is_family_member = True
+        member = family_member
+    else:
+        # If not a family member, check if it's the current user
+        if member_id == current_user:
+            member = User.query.get(current_user)
+        else:
+            return jsonify({'error': 'Unauthorized access to member data'}), 403
+    
+    if not member:
+        return jsonify({'error': 'Member not found'}), 404
+    
+    # Range ends on end_date (default today in the user's timezone) and covers `days` days
+    today = user_today(current_user)
+    days = request.args.get('days', 365, type=int)
+    if days < 1 or days > MAX_TREND_DAYS:
+        return jsonify({'error': f'Days parameter must be between 1 and {MAX_TREND_DAYS}'}), 400
+    
+    end_date_str = request.args.get('end_date')
+    if end_date_str:
+        try:
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    else:
+        end_date = today
+    start_date = end_date - timedelta(days=days - 1)
+    
+    # Rolling average windows in days, e.g. window=7,30
+    try:
+        windows = sorted({int(window) for window in request.args.get('window', '7,30').split(',')})
+    except ValueError:
+        return jsonify({'error': 'Window must be a comma-separated list of day counts'}), 400
+    if not windows or windows[0] < 1 or windows[-1] > MAX_TREND_WINDOW:
+        return jsonify({'error': f'Windows must be between 1 and {MAX_TREND_WINDOW} days'}), 400
+    
+    # Serve from the compliance cache when possible
+    cache = current_app.compliance_cache
+    key = cache_key(member_scope(member_id, is_family_member), f"trend:{','.join(map(str, windows))}", start_date, end_date)
+    cached = cache.get(key)
+    if cached is not None:
+        return jsonify(cached), 200
+    
+    # Load per-day scheduled and taken arrays
+    scheduled = np.array(get_member_schedule(member_id, is_family_member).daily(start_date, end_date), dtype=np.int64)
+    taken = np.zeros(days, dtype=np.int64)
+    for day, count in get_daily_taken_doses(member_id, start_date, end_date, is_family_member).items():
+        taken[(day - start_date).days] = count
+    
+    daily_rates = trends.rates(scheduled, taken)
+    rolling = {window: trends.rolling_rates(scheduled, taken, window) for window in windows}
+    
+    daily_data = []
+    for offset in range(days):
+        entry = {
+            'date': (start_date + timedelta(days=offset)).strftime('%Y-%m-%d'),
+            'scheduled_doses': int(scheduled[offset]),
+            'taken_doses': int(taken[offset]),
+            'compliance_rate': round(float(daily_rates[offset]), 2)
+        }
+        for window in windows:
+            entry[f'rolling_{window}'] = round(float(rolling[window][offset]), 2)
+        daily_data.append(entry)
+    
+    def resampled(period, label):
+        return [{
+            label: period_start.strftime('%Y-%m-%d'),
+            'scheduled_doses': period_scheduled,
+            'taken_doses': period_taken,
+            'compliance_rate': round(calculate_compliance_rate(period_scheduled, period_taken), 2)
+        } for period_start, period_scheduled, period_taken in trends.resample(start_date, scheduled, taken, period)]
+    
+    total_scheduled = int(scheduled.sum())
+    total_taken = int(taken.sum())
+    
+    result = {
+        'member_id': member_id,
+        'member_name': member.name,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'windows': windows,
+        'overall': {
+            'scheduled_doses': total_scheduled,
+            'taken_doses': total_taken,
+            'compliance_rate': round(calculate_compliance_rate(total_scheduled, total_taken), 2)
+        },
+        'streaks': trends.streaks(scheduled, taken),
+        'daily': daily_data,
+        'weekly': resampled('weekly', 'week_start'),
+        'monthly': resampled('monthly', 'month_start')
+    }
+    cache.set(key, result)
+    
+    return jsonify(result), 200
+
+# Get compliance for several household members and periods in one request
+@compliance_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_compliance():
+    current_user = int(get_jwt_identity())
+    User = current_app.config.get('User')
+    FamilyMember = current_app.config.get('FamilyMember')
+    
+    data = request.get_json() or {}
+    member_ids = data.get('member_ids')
+    periods = data.get('periods', ['daily'])
+    date_str = data.get('date')
+    
+    # Validate parameters
+    if not isinstance(member_ids, list) or not member_ids:
+        return jsonify({'error': 'member_ids must be a non-empty list'}), 400
+    
+    if len(member_ids) > MAX_BULK_MEMBERS:
+        return jsonify({'error': f'At most {MAX_BULK_MEMBERS} members per request'}), 400
+    
+    try:
+        member_ids = [int(member_id) for member_id in member_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'member_ids must be integers'}), 400
+    
+    if not isinstance(periods, list) or not periods or any(period not in ['daily', 'weekly', 'monthly'] for period in periods):
+        return jsonify({'error': 'Invalid periods. Use daily, weekly, or monthly'}), 400
+    
+    if date_str:
+        try:
+            target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    else:
+        target_date = user_today(current_user)
+    
+    # Authorize every member with one query; family members take precedence over the user id
+    family_members = {
+        member.id: member for member in FamilyMember.query.filter(
+            FamilyMember.id.in_(set(member_ids)),
+            FamilyMember.user_id == current_user
+        ).all()
+    }
+    unauthorized = [member_id for member_id in member_ids if member_id not in family_members and member_id != current_user]
+    if unauthorized:
+        return jsonify({'error': 'Unauthorized access to member data', 'member_ids': unauthorized}), 403
+    
+    include_user = any(member_id not in family_members for member_id in member_ids)
+    user = User.query.get(current_user) if include_user else None
+    if include_user and not user:
+        return jsonify({'error': 'Member not found'}), 404
+    
+    # Load schedules and per-day intakes for all members over the widest period
+    ranges = {period: get_period_range(period, target_date) for period in periods}
+    range_start = min(start_date for start_date, _ in ranges.values())
+    range_end = max(end_date for _, end_date in ranges.values())
+    
+    family_member_ids = list(family_members)
+    schedules = get_household_schedules(current_user, family_member_ids, include_user)
+    taken = get_household_daily_taken_doses(current_user, family_member_ids, range_start, range_end, include_user)
+    
+    members = []
+    for member_id in member_ids:
+        is_family_member = member_id in family_members
+        key = member_id if is_family_member else None
+        schedule = schedules.get(key, WeeklySchedule())
+        taken_by_date = taken.get(key, {})
+        
+        entry = {
+            'member_id': member_id,
+            'member_name': family_members[member_id].name if is_family_member else user.name,
+            'is_user': not is_family_member
+        }
+        for period, (start_date, end_date) in ranges.items():
+            scheduled_doses = schedule.count(start_date, end_date)
+            taken_doses = sum_taken_doses(taken_by_date, start_date, end_date)
+            entry[period] = {
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+                'scheduled_doses': scheduled_doses,
+                'taken_doses': taken_doses,
+                'compliance_rate': round(calculate_compliance_rate(scheduled_doses, taken_doses), 2)
+            }
+        members.append(entry)
+    
+    return jsonify({
+        'date': target_date.strftime('%Y-%m-%d'),
+        'members': members
     }), 200
 
 # Get compliance leaderboard for a family
@@ -306,7 +754,7 @@ def compliance_leaderboard(family_id):
     # Check if family_id is 0, which means the user's own family
     if family_id == 0:
         # Get all family members for the current user
-        family_members = FamilyMember.query.filter_by(user_id=current_user).all()
+        family_members = FamilyMember.query.filter_by(user_id=current_user).order_by(FamilyMember.id).all()
     else:
         # For future expansion - could support multiple families
         return jsonify({'error': 'Invalid family ID'}), 400
@@ -317,67 +765,133 @@ def compliance_leaderboard(family_id):
     if period not in ['daily', 'weekly', 'monthly']:
         return jsonify({'error': 'Invalid period. Use daily, weekly, or monthly'}), 400
     
-    # Calculate date ranges based on period
-    today = date.today()
+    # Calculate date ranges based on period, in the user's timezone
+    today = user_today(current_user)
+    start_date, end_date = get_period_range(period, today)
     
-    if period == 'daily':
-        start_date = today
-        end_date = today
-    elif period == 'weekly':
-        start_date = today - timedelta(days=today.weekday())
-        end_date = start_date + timedelta(days=6)
-    else:  # monthly
-        start_date = date(today.year, today.month, 1)
-        if today.month == 12:
-            end_date = date(today.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = date(today.year, today.month + 1, 1) - timedelta(days=1)
+    # Serve from the compliance cache when possible
+    cache = current_app.compliance_cache
+    key = cache_key(household_scope(current_user), period, start_date, end_date)
+    cached = cache.get(key)
+    if cached is not None:
+        return jsonify(cached), 200
     
     # Calculate compliance for each family member and the user
-    leaderboard = []
+    leaderboard = get_household_leaderboard(user, family_members, start_date, end_date)
     
-    # Add user to leaderboard
-    user_scheduled = get_scheduled_doses(current_user, start_date, end_date, False)
-    user_taken = get_taken_doses(current_user, start_date, end_date, False)
-    user_rate = calculate_compliance_rate(user_scheduled, user_taken)
-    
-    leaderboard.append({
-        'member_id': current_user,
-        'member_name': user.name,
-        'is_user': True,
-        'scheduled_doses': user_scheduled,
-        'taken_doses': user_taken,
-        'compliance_rate': round(user_rate, 2)
-    })
-    
-    # Add family members to leaderboard
-    for member in family_members:
-        member_scheduled = get_scheduled_doses(member.id, start_date, end_date, True)
-        member_taken = get_taken_doses(member.id, start_date, end_date, True)
-        member_rate = calculate_compliance_rate(member_scheduled, member_taken)
-        
-        leaderboard.append({
-            'member_id': member.id,
-            'member_name': member.name,
-            'is_user': False,
-            'scheduled_doses': member_scheduled,
-            'taken_doses': member_taken,
-            'compliance_rate': round(member_rate, 2)
-        })
-    
-    # Sort leaderboard by compliance rate (descending)
-    leaderboard.sort(key=lambda x: x['compliance_rate'], reverse=True)
-    
-    # Add rank to each entry
-    for i, entry in enumerate(leaderboard):
-        entry['rank'] = i + 1
-    
-    return jsonify({
+    result = {
         'period': period,
         'start_date': start_date.strftime('%Y-%m-%d'),
         'end_date': end_date.strftime('%Y-%m-%d'),
         'leaderboard': leaderboard
-    }), 200
+    }
+    cache.set(key, result)
+    
+    return jsonify(result), 200
+
+# Helper function to yield daily report rows in chunks of chunk_days (the whole range if None),
+# running one intake query per chunk
+def iter_report_chunks(member_id, start_date, end_date, is_family_member, schedule, chunk_days=None):
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = end_date
+        if chunk_days:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        
+        taken_by_date = get_daily_taken_doses(member_id, chunk_start, chunk_end, is_family_member)
+        chunk = []
+        current_date = chunk_start
+        for day_scheduled in schedule.daily(chunk_start, chunk_end):
+            day_taken = taken_by_date.get(current_date, 0)
+            day_rate = calculate_compliance_rate(day_scheduled, day_taken)
+            
+            chunk.append({
+                'date': current_date.strftime('%Y-%m-%d'),
+                'day_of_week': current_date.strftime('%A'),
+                'scheduled_doses': day_scheduled,
+                'taken_doses': day_taken,
+                'compliance_rate': round(day_rate, 2)
+            })
+            current_date += timedelta(days=1)
+        
+        yield chunk
+        chunk_start = chunk_end + timedelta(days=1)
+
+# Helper function to build the summary rows at the top of a CSV report
+def report_csv_header(member_name, period, start_date, end_date, total_scheduled, total_taken):
+    overall_rate = calculate_compliance_rate(total_scheduled, total_taken)
+    return [
+        ['Compliance Report'],
+        ['Member:', member_name],
+        ['Period:', period],
+        ['Date Range:', f'{start_date.strftime("%Y-%m-%d")} to {end_date.strftime("%Y-%m-%d")}'],
+        ['Overall Compliance Rate:', f'{round(overall_rate, 2)}%'],
+        ['Total Scheduled Doses:', total_scheduled],
+        ['Total Taken Doses:', total_taken],
+        [],
+        ['Date', 'Day of Week', 'Scheduled Doses', 'Taken Doses', 'Compliance Rate (%)']
+    ]
+
+# File-like object that hands back whatever csv.writer writes, so rows can be yielded one at a time
+class _CSVLine:
+    def write(self, value):
+        return value
+
+# Helper function to stream a compliance report as CSV or NDJSON text chunks.
+# Totals come from the closed-form schedule and one COUNT query, then the daily rows are
+# produced EXPORT_CHUNK_DAYS at a time so memory stays flat for any range.
+def iter_report_stream(member_id, member_name, period, format_type, start_date, end_date, is_family_member):
+    schedule = get_member_schedule(member_id, is_family_member)
+    total_scheduled = schedule.count(start_date, end_date)
+    total_taken = get_taken_doses(member_id, start_date, end_date, is_family_member)
+    chunks = iter_report_chunks(member_id, start_date, end_date, is_family_member, schedule, EXPORT_CHUNK_DAYS)
+    
+    if format_type == 'ndjson':
+        yield json.dumps({
+            'member': {
+                'id': member_id,
+                'name': member_name,
+                'is_user': not is_family_member
+            },
+            'period': period,
+            'date_range': {
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d')
+            },
+            'overall': {
+                'scheduled_doses': total_scheduled,
+                'taken_doses': total_taken,
+                'compliance_rate': round(calculate_compliance_rate(total_scheduled, total_taken), 2)
+            }
+        }) + '\n'
+        for chunk in chunks:
+            yield ''.join(json.dumps(day) + '\n' for day in chunk)
+    else:
+        writer = csv.writer(_CSVLine())
+        yield ''.join(writer.writerow(row) for row in report_csv_header(
+            member_name, period, start_date, end_date, total_scheduled, total_taken
+        ))
+        for chunk in chunks:
+            yield ''.join(writer.writerow([
+                day['date'],
+                day['day_of_week'],
+                day['scheduled_doses'],
+                day['taken_doses'],
+                day['compliance_rate']
+            ]) for day in chunk)
+
+# Helper function to gzip a stream of text chunks, flushing after each so clients receive data early
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+# Get compliance cache counters
+@compliance_bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+def compliance_cache_stats():
+    return jsonify(current_app.compliance_cache.stats()), 200
 
 # Export compliance report
 @compliance_bp.route('/export-report', methods=['POST'])
@@ -394,6 +908,8 @@ def export_report():
     format_type = data.get('format', 'csv')
     start_date_str = data.get('start_date')
     end_date_str = data.get('end_date')
+    stream = bool(data.get('stream')) or format_type == 'ndjson'
+    run_async = bool(data.get('async'))
     
     # Validate parameters
     if not member_id:
@@ -402,8 +918,11 @@ def export_report():
     if period not in ['daily', 'weekly', 'monthly', 'custom']:
         return jsonify({'error': 'Invalid period. Use daily, weekly, monthly, or custom'}), 400
     
-    if format_type not in ['csv', 'json']:
-        return jsonify({'error': 'Invalid format. Use csv or json'}), 400
+    if format_type not in ['csv', 'json', 'ndjson']:
+        return jsonify({'error': 'Invalid format. Use csv, json or ndjson'}), 400
+    
+    if (stream or run_async) and format_type == 'json':
+        return jsonify({'error': 'Streaming and async exports support csv or ndjson'}), 400
     
     # Check if the member_id is for a family member or the user
     is_family_member = False
@@ -424,8 +943,8 @@ def export_report():
     if not member:
         return jsonify({'error': 'Member not found'}), 404
     
-    # Calculate date range based on period
-    today = date.today()
+    # Calculate date range based on period, in the user's timezone
+    today = user_today(current_user)
     
     if period == 'custom':
         if not start_date_str or not end_date_str:
@@ -439,37 +958,53 @@ def export_report():
                 return jsonify({'error': 'Start date must be before end date'}), 400
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-    elif period == 'daily':
-        start_date = today
-        end_date = today
-    elif period == 'weekly':
-        start_date = today - timedelta(days=today.weekday())
-        end_date = start_date + timedelta(days=6)
-    else:  # monthly
-        start_date = date(today.year, today.month, 1)
-        if today.month == 12:
-            end_date = date(today.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = date(today.year, today.month + 1, 1) - timedelta(days=1)
+    else:
+        start_date, end_date = get_period_range(period, today)
     
-    # Generate report data
-    report_data = []
-    current_date = start_date
+    member_name = member.name
     
-    while current_date <= end_date:
-        day_scheduled = get_scheduled_doses(member_id, current_date, current_date, is_family_member)
-        day_taken = get_taken_doses(member_id, current_date, current_date, is_family_member)
-        day_rate = calculate_compliance_rate(day_scheduled, day_taken)
+    # Queue large reports to the local export worker pool
+    if run_async:
+        filename = f"compliance_report_{member_name.replace(' ', '_')}_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.{format_type}"
+        job = submit_export_job(current_user, format_type, {
+            'member_id': int(member_id),
+            'member_name': member_name,
+            'is_family_member': is_family_member,
+            'period': period,
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d')
+        }, filename)
+        return jsonify({
+            'message': 'Export job queued',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/compliance/export-jobs/{job.id}'
+        }), 202
+    
+    # Stream large reports instead of building them in memory
+    if stream:
+        extension = 'csv' if format_type == 'csv' else 'ndjson'
+        filename = f"compliance_report_{member_name.replace(' ', '_')}_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.{extension}"
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
         
-        report_data.append({
-            'date': current_date.strftime('%Y-%m-%d'),
-            'day_of_week': current_date.strftime('%A'),
-            'scheduled_doses': day_scheduled,
-            'taken_doses': day_taken,
-            'compliance_rate': round(day_rate, 2)
-        })
+        chunks = iter_report_stream(member_id, member_name, period, format_type, start_date, end_date, is_family_member)
+        if 'gzip' in request.accept_encodings:
+            chunks = gzip_stream(chunks)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
         
-        current_date += timedelta(days=1)
+        return Response(
+            stream_with_context(chunks),
+            mimetype='text/csv' if format_type == 'csv' else 'application/x-ndjson',
+            headers=headers
+        )
+    
+    # Generate report data
+    schedule = get_member_schedule(member_id, is_family_member)
+    report_data = [
+        day for chunk in iter_report_chunks(member_id, start_date, end_date, is_family_member, schedule)
+        for day in chunk
+    ]
     
     # Calculate overall compliance
     total_scheduled = sum(day['scheduled_doses'] for day in report_data)
@@ -483,17 +1018,9 @@ def export_report():
         writer = csv.writer(output)
         
         # Write header
-        writer.writerow(['Compliance Report'])
-        writer.writerow(['Member:', family_member.name if is_family_member else member.name])
-        writer.writerow(['Period:', period])
-        writer.writerow(['Date Range:', f'{start_date.strftime("%Y-%m-%d")} to {end_date.strftime("%Y-%m-%d")}'])
-        writer.writerow(['Overall Compliance Rate:', f'{round(overall_rate, 2)}%'])
-        writer.writerow(['Total Scheduled Doses:', total_scheduled])
-        writer.writerow(['Total Taken Doses:', total_taken])
-        writer.writerow([])
-        
-        # Write data header
-        writer.writerow(['Date', 'Day of Week', 'Scheduled Doses', 'Taken Doses', 'Compliance Rate (%)'])
+        writer.writerows(report_csv_header(
+            member_name, period, start_date, end_date, total_scheduled, total_taken
+        ))
         
         # Write data rows
         for day in report_data:
@@ -507,7 +1034,6 @@ def export_report():
         
         # Prepare response
         output.seek(0)
-        member_name = family_member.name if is_family_member else member.username
         filename = f"compliance_report_{member_name.replace(' ', '_')}_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.csv"
         
         return output.getvalue(), 200, {
@@ -519,7 +1045,7 @@ def export_report():
         report = {
             'member': {
                 'id': member_id,
-                'name': family_member.name if is_family_member else member.username,
+                'name': member_name,
                 'is_user': not is_family_member
             },
             'period': period,
@@ -537,6 +1063,56 @@ def export_report():
         
         return jsonify(report), 200
 
+# Get the status of an export job
+@compliance_bp.route('/export-jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def export_job_status(job_id):
+    current_user = int(get_jwt_identity())
+    ExportJob = current_app.config.get('ExportJob')
+    
+    clean_up_jobs()
+    job = ExportJob.query.get(job_id)
+    if not job or job.user_id != current_user:
+        return jsonify({'error': 'Export job not found'}), 404
+    
+    expired = job.expires_at is not None and job.expires_at < datetime.utcnow()
+    
+    return jsonify({
+        'job_id': job.id,
+        'status': 'expired' if expired else job.status,
+        'format': job.format,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'error': job.error,
+        'download_url': f'/compliance/export-jobs/{job.id}/download' if job.status == 'finished' and not expired else None
+    }), 200
+
+# Download the artifact of a finished export job
+@compliance_bp.route('/export-jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_export_job(job_id):
+    current_user = int(get_jwt_identity())
+    ExportJob = current_app.config.get('ExportJob')
+    
+    clean_up_jobs()
+    job = ExportJob.query.get(job_id)
+    if not job or job.user_id != current_user:
+        return jsonify({'error': 'Export job not found'}), 404
+    
+    if job.status != 'finished':
+        return jsonify({'error': f'Export job is {job.status}'}), 409
+    
+    if job.expires_at < datetime.utcnow() or not os.path.exists(job.artifact_path):
+        return jsonify({'error': 'Export has expired'}), 410
+    
+    return send_file(
+        job.artifact_path,
+        mimetype='text/csv' if job.format == 'csv' else 'application/x-ndjson',
+        as_attachment=True,
+        download_name=job.filename
+    )
+
 # Get missed doses for a member
 @compliance_bp.route('/missed-doses/<int:member_id>', methods=['GET'])
 @jwt_required()
@@ -572,7 +1148,20 @@ def missed_doses(member_id):
     if days < 1 or days > 90:
         return jsonify({'error': 'Days parameter must be between 1 and 90'}), 400
     
-    end_date = date.today()
+    # Optional paging over the missed doses (most recent first)
+    limit = request.args.get('limit', type=int)
+    if limit is not None and (limit < 1 or limit > MAX_MISSED_DOSES_PAGE):
+        return jsonify({'error': f'Limit must be between 1 and {MAX_MISSED_DOSES_PAGE}'}), 400
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_date_str, cursor_reminder_str = cursor.split(':')
+            cursor = (datetime.strptime(cursor_date_str, '%Y-%m-%d').date(), int(cursor_reminder_str))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    end_date = user_today(current_user)
     start_date = end_date - timedelta(days=days-1)  # inclusive of today
     
     # Get all active reminders for the member
@@ -583,15 +1172,14 @@ def missed_doses(member_id):
     else:
         reminder_query = reminder_query.filter(Reminder.user_id == member_id, Reminder.family_member_id == None)
     
-    reminders = reminder_query.all()
-    
-    # Get all intakes for the member in the date range
-    start_datetime = datetime.combine(start_date, datetime.min.time())
-    end_datetime = datetime.combine(end_date, datetime.max.time())
+    reminders = reminder_query.order_by(Reminder.id).all()
     
-    intake_query = SupplementIntake.query.filter(
-        SupplementIntake.taken_at >= start_datetime,
-        SupplementIntake.taken_at <= end_datetime
+    # Get the (supplement_id, local date) pairs taken by the member in the date range
+    intake_query = db.session.query(
+        SupplementIntake.supplement_id, SupplementIntake.local_date
+    ).filter(
+        SupplementIntake.local_date >= start_date,
+        SupplementIntake.local_date <= end_date
     )
     
     if is_family_member:
@@ -599,56 +1187,55 @@ def missed_doses(member_id):
     else:
         intake_query = intake_query.filter(SupplementIntake.user_id == member_id, SupplementIntake.family_member_id == None)
     
-    intakes = intake_query.all()
+    taken_keys = {(supplement_id, taken_date) for supplement_id, taken_date in intake_query.distinct().all()}
     
-    # Create a lookup of supplement_id -> taken_dates
-    taken_supplements = {}
-    for intake in intakes:
-        taken_date = intake.taken_at.date()
-        if intake.supplement_id not in taken_supplements:
-            taken_supplements[intake.supplement_id] = []
-        taken_supplements[intake.supplement_id].append(taken_date)
+    # Look up all supplement names at once
+    supplement_ids = {reminder.supplement_id for reminder in reminders}
+    supplement_names = dict(
+        db.session.query(Supplement.id, Supplement.name).filter(Supplement.id.in_(supplement_ids)).all()
+    ) if supplement_ids else {}
     
-    # Calculate missed doses
-    missed_doses = []
-    current_date = start_date
+    # Walk scheduled slots lazily, most recent first, keeping the ones not taken
+    slots = iter_scheduled_slots(reminders, start_date, end_date, after=cursor)
+    missed_slots = (
+        (slot_date, reminder) for slot_date, reminder in slots
+        if (reminder.supplement_id, slot_date) not in taken_keys
+    )
     
-    while current_date <= end_date:
-        day_name = current_date.strftime('%A')
-        
-        for reminder in reminders:
-            # Check if this day is scheduled in the reminder
-            if day_name in reminder.days.split(','):
-                supplement = Supplement.query.get(reminder.supplement_id)
-                
-                # Check if the supplement was taken on this date
-                was_taken = False
-                if reminder.supplement_id in taken_supplements:
-                    if current_date in taken_supplements[reminder.supplement_id]:
-                        was_taken = True
-                
-                if not was_taken:
-                    missed_doses.append({
-                        'date': current_date.strftime('%Y-%m-%d'),
-                        'day_of_week': day_name,
-                        'supplement_id': reminder.supplement_id,
-                        'supplement_name': supplement.name if supplement else 'Unknown',
-                        'scheduled_time': reminder.time.strftime('%H:%M') if reminder.time else 'Unknown'
-                    })
-        
-        current_date += timedelta(days=1)
+    # Total for the whole window, independent of the page being returned
+    missed_total = sum(
+        1 for slot_date, reminder in iter_scheduled_slots(reminders, start_date, end_date)
+        if (reminder.supplement_id, slot_date) not in taken_keys
+    )
     
-    # Sort missed doses by date (most recent first)
-    missed_doses.sort(key=lambda x: x['date'], reverse=True)
+    missed_doses = []
+    next_cursor = None
+    for slot_date, reminder in missed_slots:
+        if limit is not None and len(missed_doses) == limit:
+            next_cursor = f"{last_slot[0].strftime('%Y-%m-%d')}:{last_slot[1]}"
+            break
+        missed_doses.append({
+            'date': slot_date.strftime('%Y-%m-%d'),
+            'day_of_week': slot_date.strftime('%A'),
+            'supplement_id': reminder.supplement_id,
+            'supplement_name': supplement_names.get(reminder.supplement_id, 'Unknown'),
+            'scheduled_time': reminder.time.strftime('%H:%M') if reminder.time else 'Unknown'
+        })
+        last_slot = (slot_date, reminder.id)
     
-    return jsonify({
+    response = {
         'member_id': member_id,
-        'member_name': family_member.name if is_family_member else member.username,
+        'member_name': family_member.name if is_family_member else member.name,
         'date_range': {
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d'),
             'days': days
         },
-        'missed_doses_count': len(missed_doses),
+        'missed_doses_count': missed_total,
         'missed_doses': missed_doses
-    }), 200
\ No newline at end of file
+    }
+    if limit is not None:
+        response['page_count'] = len(missed_doses)
+        response['next_cursor'] = next_cursor
+    
+    return jsonify(response), 200
@@ -1,12 +1,174 @@
 from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from main import db
-from datetime import datetime, date
-import os
-from werkzeug.utils import secure_filename
+from datetime import datetime, date, timedelta, timezone
+import uuid
+from sqlalchemy import and_, or_, case, func
+from sqlalchemy.exc import IntegrityError
+from collections import Counter
+from itertools import takewhile
+from utils.compliance_rollup import apply_intake, apply_taken, refresh_scheduled
+from utils.compliance_cache import invalidate_member
+from utils.schedule import parse_days, format_days
+from utils.timezones import local_date, local_today
+from utils.stock import decrement_stock
+from utils.image_variants import image_extension, submit_image_variants, ALLOWED_IMAGE_EXTENSIONS
+from utils.storage import store_upload, store_file
+from utils.photo_hash import photo_hash, format_hash
+from utils.upload_sessions import (
+    create_upload_session, write_chunk, discard_upload_session, session_path,
+    ChunkOutOfRange, MAX_UPLOAD_SESSION_SIZE, RECOMMENDED_CHUNK_SIZE
+)
 
 supplements_bp = Blueprint('supplements', __name__)
 
+# Trailing windows (days) reported by the stats endpoint
+STATS_WINDOWS = (7, 30, 90)
+
+# Most intakes accepted by one batch logging request
+MAX_BATCH_INTAKES = 500
+
+# Most intakes accepted by one sync request, and most changes returned per sync
+MAX_SYNC_INTAKES = 500
+MAX_SYNC_CHANGES = 500
+
+# Seconds a client clock may run ahead of the server when syncing taken_at
+SYNC_CLOCK_SKEW = 300
+
+# Seconds behind the newest change that every sync reads again. updated_at is stamped when a
+# row is flushed, not when it commits, so a slow transaction (or another server's clock) can
+# make a change appear behind a sync token already handed out. Clients de-duplicate by id
+SYNC_OVERLAP = 60
+
+# Default and largest page sizes for the intake history endpoint
+DEFAULT_HISTORY_PAGE = 50
+MAX_HISTORY_PAGE = 500
+
+# Helper function to find which supplements and family members referenced by a list of
+# intake items belong to the user, with one query each
+def get_owned_intake_targets(user_id, items):
+    Supplement = current_app.config.get('Supplement')
+    FamilyMember = current_app.config.get('FamilyMember')
+    
+    items = [item for item in items if isinstance(item, dict)]
+    supplement_ids = {item.get('supplement_id') for item in items if isinstance(item.get('supplement_id'), int)}
+    family_member_ids = {item.get('family_member_id') for item in items if isinstance(item.get('family_member_id'), int)}
+    
+    owned_supplement_ids = {
+        row[0] for row in db.session.query(Supplement.id).filter(
+            Supplement.id.in_(supplement_ids),
+            Supplement.user_id == user_id
+        ).all()
+    } if supplement_ids else set()
+    owned_family_member_ids = {
+        row[0] for row in db.session.query(FamilyMember.id).filter(
+            FamilyMember.id.in_(family_member_ids),
+            FamilyMember.user_id == user_id
+        ).all()
+    } if family_member_ids else set()
+    return owned_supplement_ids, owned_family_member_ids
+
+# Helper function to validate one batch or sync intake item; returns an error message or None
+def intake_item_error(item, owned_supplement_ids, owned_family_member_ids):
+    if not isinstance(item, dict):
+        return 'Intake must be an object'
+    if item.get('supplement_id') not in owned_supplement_ids:
+        return 'Supplement not found'
+    family_member_id = item.get('family_member_id')
+    if family_member_id and family_member_id not in owned_family_member_ids:
+        return 'Family member not found or not associated with user'
+    return None
+
+# Helper function to insert new intake rows (dicts with the same keys, each with a client_id)
+# in one executemany INSERT and read their ids back with one SELECT. The ORM only batches
+# inserts on databases that return the new ids (not MySQL) and otherwise sends one INSERT per row
+def insert_intakes(user_id, rows):
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    db.session.execute(SupplementIntake.__table__.insert(), rows)
+    return dict(
+        db.session.query(SupplementIntake.client_id, SupplementIntake.id).filter(
+            SupplementIntake.user_id == user_id,
+            SupplementIntake.client_id.in_([row['client_id'] for row in rows])
+        ).all()
+    )
+
+# Helper function to stage the rollup and stock changes for newly inserted intake rows. Returns the
+# new stock level per supplement and the (family_member_id, local_date) pairs that changed.
+def apply_new_intakes(user_id, intakes):
+    Supplement = current_app.config.get('Supplement')
+    
+    # Update the rollup once per member and day
+    doses_per_member_day = Counter((intake['family_member_id'], intake['local_date']) for intake in intakes)
+    for (family_member_id, taken_date), doses in doses_per_member_day.items():
+        apply_taken(user_id, family_member_id, taken_date, doses)
+    
+    # Update stock levels atomically once per supplement, in id order so concurrent
+    # requests lock rows in the same order
+    stock_levels = {}
+    doses_per_supplement = Counter(intake['supplement_id'] for intake in intakes)
+    for supplement_id in sorted(doses_per_supplement):
+        stock_levels[supplement_id] = decrement_stock(Supplement.stock_level, supplement_id, doses_per_supplement[supplement_id])
+    
+    return stock_levels, list(doses_per_member_day)
+
+# Helper function to invalidate cached compliance for (family_member_id, local_date) pairs
+def invalidate_intake_days(user_id, member_days):
+    for family_member_id, taken_date in member_days:
+        invalidate_member(current_app.compliance_cache, user_id, family_member_id, taken_date)
+
+# Helper function to parse a client ISO 8601 timestamp into naive UTC (naive input is taken as UTC)
+def parse_client_timestamp(value):
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+# Helper function to attach a stored photo to an intake, check it against the user's earlier
+# photos and queue its resized variants
+def attach_photo_confirmation(intake, key):
+    phash = None
+    if intake.photo_confirmation != key:
+        intake.photo_confirmation = key
+        intake.photo_thumb = None
+        intake.photo_medium = None
+        
+        with current_app.storage.open(key) as photo:
+            phash = photo_hash(photo)
+        similar = []
+        if phash is not None:
+            similar = current_app.photo_hash_index.find_similar(intake.user_id, phash, exclude_intake_id=intake.id)
+        intake.photo_phash = format_hash(phash) if phash is not None else None
+        intake.photo_reuse_of = similar[0] if similar else None
+    db.session.commit()
+    
+    if phash is not None:
+        current_app.photo_hash_index.add(intake.user_id, intake.id, phash)
+    
+    # The worker pool stores a copy without EXIF/GPS metadata and thumbnail and medium variants,
+    # points the intake at them and deletes this upload; key stops resolving once that is done
+    submit_image_variants('SupplementIntake', intake.id, 'photo_confirmation',
+                          {'thumb': 'photo_thumb', 'medium': 'photo_medium'}, key)
+    
+    return {
+        'message': 'Photo confirmation uploaded successfully',
+        'intake_id': intake.id,
+        'photo_path': key,
+        'photo_url': f'/uploads/{key}',
+        'suspected_reuse': intake.photo_reuse_of is not None,
+        'photo_reuse_of': intake.photo_reuse_of
+    }
+
+# Helper function to describe an upload session to the client
+def upload_session_status(session):
+    return {
+        'upload_id': session.id,
+        'intake_id': session.intake_id,
+        'size': session.size,
+        'offset': session.received,
+        'chunk_size': RECOMMENDED_CHUNK_SIZE,
+        'expires_at': session.expires_at.isoformat()
+    }
+
 # Create a new supplement
 @supplements_bp.route('/create', methods=['POST'])
 @jwt_required()
@@ -74,6 +236,8 @@ def get_all_supplements():
             'stock_level': supplement.stock_level,
             'low_stock_threshold': supplement.low_stock_threshold,
             'image_url': supplement.image_url,
+            'image_thumb_url': supplement.image_thumb_url,
+            'image_medium_url': supplement.image_medium_url,
             'created_at': supplement.created_at.isoformat()
         })
     
@@ -111,8 +275,11 @@ def update_supplement(supplement_id):
         supplement.stock_level = data['stock_level']
     if 'low_stock_threshold' in data:
         supplement.low_stock_threshold = data['low_stock_threshold']
-    if 'image_url' in data:
+    if 'image_url' in data and data['image_url'] != supplement.image_url:
         supplement.image_url = data['image_url']
+        # Variants belong to the previous image
+        supplement.image_thumb_url = None
+        supplement.image_medium_url = None
     
     db.session.commit()
     
@@ -183,28 +350,346 @@ def log_supplement_intake():
         if not family_member or family_member.user_id != current_user:
             return jsonify({'error': 'Family member not found or not associated with user'}), 404
     
-    # Create intake record
+    # Create intake record, bucketed by the day in the user's timezone
+    taken_at = datetime.utcnow()
     intake = SupplementIntake(
         supplement_id=supplement_id,
         user_id=current_user,
         family_member_id=family_member_id,
+        taken_at=taken_at,
+        local_date=local_date(taken_at, user.timezone),
         dosage_taken=dosage_taken,
         notes=notes
     )
     
-    # Update stock level
-    if supplement.stock_level > 0:
-        supplement.stock_level -= 1
-    
     db.session.add(intake)
+    apply_intake(intake)
+    
+    # Update stock level atomically, last so the row lock is held only until the commit
+    stock_level = decrement_stock(Supplement.stock_level, supplement.id)
     db.session.commit()
+    invalidate_member(current_app.compliance_cache, current_user, family_member_id, intake.local_date)
     
     return jsonify({
         'message': 'Supplement intake logged successfully',
         'intake_id': intake.id,
-        'taken_at': intake.taken_at.isoformat()
+        'taken_at': intake.taken_at.isoformat(),
+        'local_date': intake.local_date.isoformat(),
+        'stock_level': stock_level
     }), 201
 
+# Log several supplement intakes at once (e.g. a household's morning doses)
+@supplements_bp.route('/log-intake/batch', methods=['POST'])
+@jwt_required()
+def log_supplement_intake_batch():
+    from flask import current_app
+    current_user = int(get_jwt_identity())
+    User = current_app.config.get('User')
+    
+    user = User.query.get(current_user)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    data = request.get_json() or {}
+    items = data.get('intakes')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'intakes must be a non-empty list'}), 400
+    
+    if len(items) > MAX_BATCH_INTAKES:
+        return jsonify({'error': f'At most {MAX_BATCH_INTAKES} intakes per request'}), 400
+    
+    # Verify every referenced supplement and family member with one query each
+    owned_ids = get_owned_intake_targets(current_user, items)
+    
+    # Create intake rows, all bucketed by the same local day. Each gets a client id unique to
+    # this request so the new ids can be read back in one query
+    taken_at = datetime.utcnow()
+    taken_date = local_date(taken_at, user.timezone)
+    batch_key = uuid.uuid4().hex
+    results = []
+    intakes = []
+    stock_levels = {}
+    for index, item in enumerate(items):
+        error = intake_item_error(item, *owned_ids)
+        if error:
+            results.append({'index': index, 'status': 'error', 'error': error})
+            continue
+        
+        intakes.append({
+            'supplement_id': item['supplement_id'],
+            'user_id': current_user,
+            'family_member_id': item.get('family_member_id') or None,
+            'taken_at': taken_at,
+            'local_date': taken_date,
+            'dosage_taken': item.get('dosage_taken'),
+            'notes': item.get('notes'),
+            'client_id': f'batch-{batch_key}-{index}'
+        })
+        results.append({'index': index, 'status': 'logged'})
+    
+    if intakes:
+        intake_ids = insert_intakes(current_user, intakes)
+        for result in results:
+            if result['status'] == 'logged':
+                result['intake_id'] = intake_ids[f"batch-{batch_key}-{result['index']}"]
+        
+        stock_levels, member_days = apply_new_intakes(current_user, intakes)
+        db.session.commit()
+        invalidate_intake_days(current_user, member_days)
+    
+    return jsonify({
+        'message': f'{len(intakes)} of {len(items)} supplement intakes logged',
+        'taken_at': taken_at.isoformat(),
+        'local_date': taken_date.isoformat(),
+        'logged': len(intakes),
+        'failed': len(items) - len(intakes),
+        'stock_levels': {str(supplement_id): level for supplement_id, level in stock_levels.items()},
+        'results': results
+    }), 201 if intakes else 400
+
+# Sync intakes queued by an offline client and return intakes changed elsewhere
+@supplements_bp.route('/sync', methods=['POST'])
+@jwt_required()
+def sync_intakes():
+    from flask import current_app
+    current_user = int(get_jwt_identity())
+    User = current_app.config.get('User')
+    Supplement = current_app.config.get('Supplement')
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    IntakeDeletion = current_app.config.get('IntakeDeletion')
+    
+    user = User.query.get(current_user)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    data = request.get_json() or {}
+    items = data.get('intakes', [])
+    if not isinstance(items, list):
+        return jsonify({'error': 'intakes must be a list'}), 400
+    
+    if len(items) > MAX_SYNC_INTAKES:
+        return jsonify({'error': f'At most {MAX_SYNC_INTAKES} intakes per request'}), 400
+    
+    # The sync token is the (updated_at, id) of the last settled change and the id of the last
+    # deletion the client has seen; tokens issued before deletions were tracked have no deletion id
+    sync_token = data.get('sync_token')
+    if sync_token:
+        try:
+            token_parts = sync_token.split('_')
+            if len(token_parts) not in (2, 3):
+                raise ValueError(sync_token)
+            sync_token = (
+                datetime.fromisoformat(token_parts[0]),
+                int(token_parts[1]),
+                int(token_parts[2]) if len(token_parts) == 3 else 0
+            )
+        except (AttributeError, ValueError):
+            return jsonify({'error': 'Invalid sync token'}), 400
+    
+    owned_ids = get_owned_intake_targets(current_user, items)
+    
+    # Client ids already stored for the user are replays of earlier syncs
+    client_ids = {
+        item.get('client_id') for item in items
+        if isinstance(item, dict) and isinstance(item.get('client_id'), str)
+    }
+    stored_ids = dict(
+        db.session.query(SupplementIntake.client_id, SupplementIntake.id).filter(
+            SupplementIntake.user_id == current_user,
+            SupplementIntake.client_id.in_(client_ids)
+        ).all()
+    ) if client_ids else {}
+    # Client ids of intakes deleted since they were synced must not be stored again
+    deleted_ids = dict(
+        db.session.query(IntakeDeletion.client_id, IntakeDeletion.intake_id).filter(
+            IntakeDeletion.user_id == current_user,
+            IntakeDeletion.client_id.in_(client_ids)
+        ).all()
+    ) if client_ids else {}
+    
+    latest_allowed = datetime.utcnow() + timedelta(seconds=SYNC_CLOCK_SKEW)
+    results = []
+    new_intakes = {}
+    for item in items:
+        client_id = item.get('client_id') if isinstance(item, dict) else None
+        if not isinstance(client_id, str) or not client_id or len(client_id) > 64:
+            results.append({'client_id': None, 'status': 'error', 'error': 'client_id must be a non-empty string of at most 64 characters'})
+            continue
+        
+        if client_id in stored_ids or client_id in new_intakes:
+            results.append({'client_id': client_id, 'status': 'duplicate'})
+            continue
+        
+        if client_id in deleted_ids:
+            results.append({'client_id': client_id, 'status': 'deleted', 'intake_id': deleted_ids[client_id]})
+            continue
+        
+        error = intake_item_error(item, *owned_ids)
+        if not error:
+            try:
+                taken_at = parse_client_timestamp(item['taken_at']) if item.get('taken_at') else datetime.utcnow()
+                if taken_at > latest_allowed:
+                    error = 'taken_at is in the future'
+            except (TypeError, ValueError):
+                error = 'Invalid taken_at. Use an ISO 8601 timestamp'
+        if error:
+            results.append({'client_id': client_id, 'status': 'error', 'error': error})
+            continue
+        
+        new_intakes[client_id] = {
+            'supplement_id': item['supplement_id'],
+            'user_id': current_user,
+            'family_member_id': item.get('family_member_id') or None,
+            'taken_at': taken_at,
+            'local_date': local_date(taken_at, user.timezone),
+            'dosage_taken': item.get('dosage_taken'),
+            'notes': item.get('notes'),
+            'client_id': client_id
+        }
+        results.append({'client_id': client_id, 'status': 'created'})
+    
+    stock_levels = {}
+    if new_intakes:
+        # The unique (user_id, client_id) index rejects a concurrent sync of the same intakes;
+        # retrying then reports them as duplicates
+        try:
+            stored_ids.update(insert_intakes(current_user, list(new_intakes.values())))
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'Some intakes were stored by a concurrent sync. Retry the request'}), 409
+        
+        stock_levels, member_days = apply_new_intakes(current_user, list(new_intakes.values()))
+        db.session.commit()
+        invalidate_intake_days(current_user, member_days)
+    
+    for result in results:
+        if result['status'] in ('created', 'duplicate'):
+            result['intake_id'] = stored_ids[result['client_id']]
+    
+    # Intakes changed since the sync token, oldest first, leaving out the ones just pushed
+    query = db.session.query(SupplementIntake, Supplement.name).outerjoin(
+        Supplement, Supplement.id == SupplementIntake.supplement_id
+    ).filter(SupplementIntake.user_id == current_user)
+    
+    if sync_token:
+        query = query.filter(or_(
+            SupplementIntake.updated_at > sync_token[0],
+            and_(SupplementIntake.updated_at == sync_token[0], SupplementIntake.id > sync_token[1])
+        ))
+    
+    rows = query.order_by(SupplementIntake.updated_at, SupplementIntake.id).limit(MAX_SYNC_CHANGES + 1).all()
+    more_changes = len(rows) > MAX_SYNC_CHANGES
+    rows = rows[:MAX_SYNC_CHANGES]
+    
+    # The token only moves past changes older than SYNC_OVERLAP; newer ones are sent again by
+    # the next sync in case an earlier-stamped transaction commits after this one is read
+    settled_before = datetime.utcnow() - timedelta(seconds=SYNC_OVERLAP)
+    
+    # Intakes deleted since the sync token, held back by SYNC_OVERLAP like the changes; a first
+    # sync has nothing to delete and starts from the newest settled deletion
+    if sync_token:
+        last_deletion_id = sync_token[2]
+        deletions = IntakeDeletion.query.filter(
+            IntakeDeletion.user_id == current_user,
+            IntakeDeletion.id > last_deletion_id
+        ).order_by(IntakeDeletion.id).limit(MAX_SYNC_CHANGES + 1).all()
+        more_deletions = len(deletions) > MAX_SYNC_CHANGES
+        deletions = deletions[:MAX_SYNC_CHANGES]
+        settled_deletions = list(takewhile(lambda deletion: deletion.deleted_at < settled_before, deletions))
+        if settled_deletions:
+            last_deletion_id = settled_deletions[-1].id
+        elif deletions:
+            more_deletions = False
+    else:
+        deletions = []
+        more_deletions = False
+        last_deletion_id = db.session.query(func.max(IntakeDeletion.id)).filter(
+            IntakeDeletion.user_id == current_user,
+            IntakeDeletion.deleted_at < settled_before
+        ).scalar() or 0
+    
+    last_updated_at, last_intake_id = sync_token[:2] if sync_token else (datetime(1970, 1, 1), 0)
+    settled_rows = [intake for intake, _ in rows if intake.updated_at < settled_before]
+    if settled_rows:
+        last_updated_at, last_intake_id = settled_rows[-1].updated_at, settled_rows[-1].id
+    else:
+        # The next page would start at the same token; let the client wait for changes to settle
+        more_changes = False
+    next_token = f"{last_updated_at.isoformat()}_{last_intake_id}_{last_deletion_id}"
+    
+    pushed_ids = {result['intake_id'] for result in results if result['status'] in ('created', 'duplicate')}
+    changes = []
+    for intake, supplement_name in rows:
+        if intake.id in pushed_ids:
+            continue
+        changes.append({
+            'id': intake.id,
+            'client_id': intake.client_id,
+            'supplement_id': intake.supplement_id,
+            'supplement_name': supplement_name or 'Unknown',
+            'family_member_id': intake.family_member_id,
+            'dosage_taken': intake.dosage_taken,
+            'taken_at': intake.taken_at.isoformat(),
+            'local_date': intake.local_date.isoformat(),
+            'notes': intake.notes,
+            'photo_confirmation': intake.photo_confirmation,
+            'photo_thumb': intake.photo_thumb,
+            'photo_medium': intake.photo_medium,
+            'photo_reuse_of': intake.photo_reuse_of,
+            'updated_at': intake.updated_at.isoformat()
+        })
+    
+    return jsonify({
+        'results': results,
+        'stock_levels': {str(supplement_id): level for supplement_id, level in stock_levels.items()},
+        'changes': changes,
+        # Apply deletions before changes: SQLite can reuse the id of the newest deleted intake
+        'deleted': [{
+            'id': deletion.intake_id,
+            'client_id': deletion.client_id,
+            'deleted_at': deletion.deleted_at.isoformat()
+        } for deletion in deletions],
+        'sync_token': next_token,
+        'has_more': more_changes or more_deletions
+    }), 200
+
+# Delete a supplement intake
+@supplements_bp.route('/intake/<int:intake_id>', methods=['DELETE'])
+@jwt_required()
+def delete_supplement_intake(intake_id):
+    from flask import current_app
+    current_user = int(get_jwt_identity())
+    User = current_app.config.get('User')
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    IntakeDeletion = current_app.config.get('IntakeDeletion')
+    UploadSession = current_app.config.get('UploadSession')
+    
+    user = User.query.get(current_user)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    intake = SupplementIntake.query.get(intake_id)
+    if not intake:
+        return jsonify({'error': 'Intake record not found'}), 404
+    
+    if intake.user_id != current_user:
+        return jsonify({'error': 'Unauthorized access to intake record'}), 403
+    
+    # Unfinished photo uploads for the intake go with it
+    for session in UploadSession.query.filter_by(intake_id=intake.id).all():
+        discard_upload_session(session)
+    
+    apply_intake(intake, -1)
+    # Offline clients learn about the deletion from the sync feed
+    db.session.add(IntakeDeletion(user_id=current_user, intake_id=intake.id, client_id=intake.client_id))
+    db.session.delete(intake)
+    db.session.commit()
+    invalidate_member(current_app.compliance_cache, current_user, intake.family_member_id, intake.local_date)
+    
+    return jsonify({
+        'message': 'Supplement intake deleted successfully'
+    }), 200
+
 # Get today's intake for a member
 @supplements_bp.route('/today-intake/<int:member_id>', methods=['GET'])
 @jwt_required()
@@ -226,20 +711,20 @@ def get_today_intake(member_id):
         if not family_member or family_member.user_id != current_user:
             return jsonify({'error': 'Unauthorized access to member data'}), 403
     
-    # Get today's date
-    today = date.today()
+    # Get today's date in the user's timezone
+    today = local_today(user.timezone)
     
     # Query intakes for today
     if member_id == current_user:
         intakes = SupplementIntake.query.filter(
             SupplementIntake.user_id == current_user,
             SupplementIntake.family_member_id.is_(None),
-            db.func.date(SupplementIntake.taken_at) == today
+            SupplementIntake.local_date == today
         ).all()
     else:
         intakes = SupplementIntake.query.filter(
             SupplementIntake.family_member_id == member_id,
-            db.func.date(SupplementIntake.taken_at) == today
+            SupplementIntake.local_date == today
         ).all()
     
     result = []
@@ -251,8 +736,12 @@ def get_today_intake(member_id):
             'supplement_name': supplement.name if supplement else 'Unknown',
             'dosage_taken': intake.dosage_taken,
             'taken_at': intake.taken_at.isoformat(),
+            'local_date': intake.local_date.isoformat(),
             'notes': intake.notes,
-            'photo_confirmation': intake.photo_confirmation
+            'photo_confirmation': intake.photo_confirmation,
+            'photo_thumb': intake.photo_thumb,
+            'photo_medium': intake.photo_medium,
+            'photo_reuse_of': intake.photo_reuse_of
         })
     
     return jsonify(result), 200
@@ -285,21 +774,26 @@ def upload_supplement_image(supplement_id):
     if image.filename == '':
         return jsonify({'error': 'No image selected for uploading'}), 400
     
-    # Create uploads directory if it doesn't exist
-    uploads_dir = os.path.join(current_app.root_path, 'uploads', 'supplements')
-    os.makedirs(uploads_dir, exist_ok=True)
+    extension = image_extension(image.filename)
+    if not extension:
+        return jsonify({'error': f"Image must be one of: {', '.join(sorted(ALLOWED_IMAGE_EXTENSIONS))}"}), 400
     
-    # Save the file
-    filename = secure_filename(f"supplement_{supplement_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg")
-    image_path = os.path.join(uploads_dir, filename)
-    image.save(image_path)
+    # Store the file under its content hash; identical images share one blob
+    key = store_upload(current_app.storage, image.stream, 'supplements', extension)
     
     # Update the supplement record with the image URL
-    # Store the relative path to the file
-    relative_path = f'/uploads/supplements/{filename}'
-    supplement.image_url = relative_path
+    relative_path = f'/uploads/{key}'
+    if supplement.image_url != relative_path:
+        supplement.image_url = relative_path
+        supplement.image_thumb_url = None
+        supplement.image_medium_url = None
     db.session.commit()
     
+    # The worker pool stores a copy without EXIF/GPS metadata and thumbnail and medium variants,
+    # points the supplement at them and deletes this upload; relative_path stops resolving then
+    submit_image_variants('Supplement', supplement.id, 'image_url',
+                          {'thumb': 'image_thumb_url', 'medium': 'image_medium_url'}, key, '/uploads/')
+    
     return jsonify({
         'message': 'Supplement image uploaded successfully',
         'image_url': relative_path
@@ -337,23 +831,138 @@ def upload_photo_confirmation():
     if photo.filename == '':
         return jsonify({'error': 'No photo selected for uploading'}), 400
     
-    # Create uploads directory if it doesn't exist
-    uploads_dir = os.path.join(current_app.root_path, 'uploads', 'supplements')
-    os.makedirs(uploads_dir, exist_ok=True)
+    extension = image_extension(photo.filename)
+    if not extension:
+        return jsonify({'error': f"Photo must be one of: {', '.join(sorted(ALLOWED_IMAGE_EXTENSIONS))}"}), 400
     
-    # Save the file
-    filename = secure_filename(f"{current_user}_{intake_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg")
-    photo_path = os.path.join(uploads_dir, filename)
-    photo.save(photo_path)
+    # Store the file under its content hash, in a prefix only this user may read
+    key = store_upload(current_app.storage, photo.stream, f'confirmations/{current_user}', extension)
     
-    # Update the intake record
-    intake.photo_confirmation = filename
-    db.session.commit()
+    return jsonify(attach_photo_confirmation(intake, key)), 201
+
+# Start a resumable photo confirmation upload
+@supplements_bp.route('/photo-uploads', methods=['POST'])
+@jwt_required()
+def create_photo_upload():
+    from flask import current_app
+    current_user = int(get_jwt_identity())
+    User = current_app.config.get('User')
+    SupplementIntake = current_app.config.get('SupplementIntake')
     
-    return jsonify({
-        'message': 'Photo confirmation uploaded successfully',
-        'photo_path': filename
-    }), 201
+    user = User.query.get(current_user)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    data = request.get_json() or {}
+    intake_id = data.get('intake_id')
+    size = data.get('size')
+    if not intake_id:
+        return jsonify({'error': 'Intake ID is required'}), 400
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return jsonify({'error': 'size must be a positive number of bytes'}), 400
+    if size > MAX_UPLOAD_SESSION_SIZE:
+        return jsonify({'error': f'Photo must be at most {MAX_UPLOAD_SESSION_SIZE} bytes'}), 413
+    
+    extension = image_extension(data.get('filename'))
+    if not extension:
+        return jsonify({'error': f"Photo must be one of: {', '.join(sorted(ALLOWED_IMAGE_EXTENSIONS))}"}), 400
+    
+    intake = SupplementIntake.query.get(intake_id)
+    if not intake:
+        return jsonify({'error': 'Intake record not found'}), 404
+    
+    if intake.user_id != current_user:
+        return jsonify({'error': 'Unauthorized access to intake record'}), 403
+    
+    session = create_upload_session(current_user, intake.id, extension, size)
+    
+    return jsonify(upload_session_status(session)), 201
+
+# Helper function to load an unexpired upload session owned by the user
+def get_upload_session(upload_id, user_id):
+    UploadSession = current_app.config.get('UploadSession')
+    
+    session = UploadSession.query.get(upload_id)
+    if not session or session.user_id != user_id:
+        return None, (jsonify({'error': 'Upload session not found'}), 404)
+    if session.expires_at < datetime.utcnow():
+        return None, (jsonify({'error': 'Upload session has expired'}), 410)
+    return session, None
+
+# Get the offset to resume an upload from
+@supplements_bp.route('/photo-uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def photo_upload_status(upload_id):
+    current_user = int(get_jwt_identity())
+    
+    session, error = get_upload_session(upload_id, current_user)
+    if error:
+        return error
+    
+    return jsonify(upload_session_status(session)), 200
+
+# Upload one chunk of a photo: the raw request body is written at ?offset=
+@supplements_bp.route('/photo-uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+def upload_photo_chunk(upload_id):
+    current_user = int(get_jwt_identity())
+    
+    session, error = get_upload_session(upload_id, current_user)
+    if error:
+        return error
+    
+    offset = request.args.get('offset', type=int)
+    if offset is None or offset < 0:
+        return jsonify({'error': 'offset must be a non-negative integer'}), 400
+    
+    # Chunks may repeat bytes already received (a retry) but must not leave a gap
+    if offset > session.received:
+        return jsonify({
+            'error': 'Chunk does not continue the upload',
+            'offset': session.received
+        }), 409
+    
+    try:
+        write_chunk(session, offset, request.stream)
+    except ChunkOutOfRange:
+        return jsonify({
+            'error': f'Chunk runs past the declared size of {session.size} bytes',
+            'offset': session.received
+        }), 400
+    
+    return jsonify(upload_session_status(session)), 200
+
+# Finish a resumable upload and attach the photo to its intake
+@supplements_bp.route('/photo-uploads/<upload_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_photo_upload(upload_id):
+    from flask import current_app
+    current_user = int(get_jwt_identity())
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    
+    session, error = get_upload_session(upload_id, current_user)
+    if error:
+        return error
+    
+    if session.received < session.size:
+        return jsonify({
+            'error': 'Upload is incomplete',
+            'offset': session.received,
+            'size': session.size
+        }), 409
+    
+    intake = SupplementIntake.query.get(session.intake_id)
+    if not intake or intake.user_id != current_user:
+        discard_upload_session(session)
+        db.session.commit()
+        return jsonify({'error': 'Intake record not found'}), 404
+    
+    # Move the staged file into storage under its content hash
+    key = store_file(current_app.storage, session_path(current_app, session.id),
+                     f'confirmations/{current_user}', session.extension)
+    discard_upload_session(session)
+    
+    return jsonify(attach_photo_confirmation(intake, key)), 201
 
 # Set reminder settings
 @supplements_bp.route('/reminder-settings', methods=['POST'])
@@ -374,7 +983,7 @@ def set_reminder_settings():
     supplement_id = data.get('supplement_id')
     family_member_id = data.get('family_member_id')
     time = data.get('time')  # Format: 'HH:MM'
-    days = data.get('days')  # Format: 'Mon,Tue,Wed'
+    days = data.get('days')  # Format: 'Mon,Tue,Wed' or 'Monday,Tuesday,Wednesday'
     
     if not supplement_id or not time or not days:
         return jsonify({'error': 'Missing required fields'}), 400
@@ -398,6 +1007,16 @@ def set_reminder_settings():
     except ValueError:
         return jsonify({'error': 'Invalid time format. Use HH:MM'}), 400
     
+    # Parse days into a weekday mask (parse_days is cached, so only strings can be passed to it)
+    days_mask = 0
+    if isinstance(days, str):
+        try:
+            days_mask = parse_days(days, strict=True)
+        except ValueError:
+            days_mask = 0
+    if not days_mask:
+        return jsonify({'error': 'Invalid days. Use day names such as Mon,Tue or Monday,Tuesday'}), 400
+    
     # Create or update reminder
     reminder = Reminder.query.filter_by(
         supplement_id=supplement_id,
@@ -407,7 +1026,8 @@ def set_reminder_settings():
     
     if reminder:
         reminder.time = time_obj
-        reminder.days = days
+        reminder.days = format_days(days_mask)
+        reminder.days_mask = days_mask
         reminder.active = True
     else:
         reminder = Reminder(
@@ -415,11 +1035,15 @@ def set_reminder_settings():
             user_id=current_user,
             family_member_id=family_member_id,
             time=time_obj,
-            days=days
+            days=format_days(days_mask),
+            days_mask=days_mask
         )
         db.session.add(reminder)
     
+    refresh_scheduled(current_user, family_member_id)
     db.session.commit()
+    # Schedules apply to every period, so drop all cached compliance for the member
+    invalidate_member(current_app.compliance_cache, current_user, family_member_id)
     
     return jsonify({
         'message': 'Reminder settings saved successfully',
@@ -447,36 +1071,46 @@ def get_supplement_stats(member_id):
         if not family_member or family_member.user_id != current_user:
             return jsonify({'error': 'Unauthorized access to member data'}), 403
     
-    # Get all supplements for the user
-    supplements = Supplement.query.filter_by(user_id=current_user).all()
+    # Intakes of this member only; family member ids overlap user ids
+    if member_id == current_user:
+        member_filter = and_(SupplementIntake.user_id == current_user, SupplementIntake.family_member_id.is_(None))
+    else:
+        member_filter = SupplementIntake.family_member_id == member_id
+    
+    # Count intakes per trailing window (local dates, today inclusive) with conditional sums
+    today = local_today(user.timezone)
+    window_counts = [
+        func.sum(case((SupplementIntake.local_date >= today - timedelta(days=days - 1), 1), else_=0))
+        for days in STATS_WINDOWS
+    ]
+    
+    # One grouped query over all of the user's supplements, outer joined to the member's intakes
+    rows = db.session.query(
+        Supplement.id,
+        Supplement.name,
+        func.count(SupplementIntake.id),
+        func.max(SupplementIntake.taken_at),
+        *window_counts
+    ).outerjoin(
+        SupplementIntake, and_(SupplementIntake.supplement_id == Supplement.id, member_filter)
+    ).filter(
+        Supplement.user_id == current_user
+    ).group_by(Supplement.id, Supplement.name).order_by(Supplement.id).all()
     
-    # Calculate stats for each supplement
     stats = []
-    for supplement in supplements:
-        # Query intakes for this supplement and member
-        if member_id == current_user:
-            intakes = SupplementIntake.query.filter(
-                SupplementIntake.supplement_id == supplement.id,
-                SupplementIntake.user_id == current_user,
-                SupplementIntake.family_member_id.is_(None)
-            ).all()
-        else:
-            intakes = SupplementIntake.query.filter(
-                SupplementIntake.supplement_id == supplement.id,
-                SupplementIntake.family_member_id == member_id
-            ).all()
-        
-        # Calculate adherence rate (last 30 days)
-        thirty_days_ago = datetime.now() - db.func.interval(30, 'day')
-        recent_intakes = [i for i in intakes if i.taken_at >= thirty_days_ago]
-        adherence_rate = len(recent_intakes) / 30 * 100 if recent_intakes else 0
-        
+    for supplement_id, supplement_name, total_intakes, last_taken, *counts in rows:
+        # Adherence assumes one dose per day over each window
+        adherence = {
+            f'{days}d': round((count or 0) / days * 100, 2)
+            for days, count in zip(STATS_WINDOWS, counts)
+        }
         stats.append({
-            'supplement_id': supplement.id,
-            'supplement_name': supplement.name,
-            'total_intakes': len(intakes),
-            'adherence_rate': round(adherence_rate, 2),
-            'last_taken': intakes[-1].taken_at.isoformat() if intakes else None
+            'supplement_id': supplement_id,
+            'supplement_name': supplement_name,
+            'total_intakes': total_intakes,
+            'adherence_rate': adherence['30d'],
+            'adherence': adherence,
+            'last_taken': last_taken.isoformat() if last_taken else None
         })
     
     return jsonify(stats), 200
@@ -537,8 +1171,23 @@ def get_supplement_history(member_id):
     end_date = request.args.get('end_date')
     supplement_id = request.args.get('supplement_id')
     
-    # Build query
-    query = SupplementIntake.query
+    # Page through intakes newest first, keyed on (taken_at, id)
+    limit = request.args.get('limit', DEFAULT_HISTORY_PAGE, type=int)
+    if limit < 1 or limit > MAX_HISTORY_PAGE:
+        return jsonify({'error': f'Limit must be between 1 and {MAX_HISTORY_PAGE}'}), 400
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_taken_str, cursor_id_str = cursor.rsplit('_', 1)
+            cursor = (datetime.fromisoformat(cursor_taken_str), int(cursor_id_str))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # Build query, joining the supplement name instead of loading each supplement
+    query = db.session.query(SupplementIntake, Supplement.name).outerjoin(
+        Supplement, Supplement.id == SupplementIntake.supplement_id
+    )
     
     if member_id == current_user:
         query = query.filter(
@@ -554,31 +1203,50 @@ def get_supplement_history(member_id):
     if start_date:
         try:
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(SupplementIntake.taken_at) >= start_date_obj)
+            query = query.filter(SupplementIntake.local_date >= start_date_obj)
         except ValueError:
             return jsonify({'error': 'Invalid start_date format. Use YYYY-MM-DD'}), 400
     
     if end_date:
         try:
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(SupplementIntake.taken_at) <= end_date_obj)
+            query = query.filter(SupplementIntake.local_date <= end_date_obj)
         except ValueError:
             return jsonify({'error': 'Invalid end_date format. Use YYYY-MM-DD'}), 400
     
-    # Order by taken_at descending
-    intakes = query.order_by(SupplementIntake.taken_at.desc()).all()
+    if cursor:
+        query = query.filter(or_(
+            SupplementIntake.taken_at < cursor[0],
+            and_(SupplementIntake.taken_at == cursor[0], SupplementIntake.id < cursor[1])
+        ))
+    
+    # Order by taken_at descending, fetching one extra row to know whether another page exists
+    rows = query.order_by(SupplementIntake.taken_at.desc(), SupplementIntake.id.desc()).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_intake = rows[-1][0]
+        next_cursor = f"{last_intake.taken_at.isoformat()}_{last_intake.id}"
     
     result = []
-    for intake in intakes:
-        supplement = Supplement.query.get(intake.supplement_id)
+    for intake, supplement_name in rows:
         result.append({
             'id': intake.id,
             'supplement_id': intake.supplement_id,
-            'supplement_name': supplement.name if supplement else 'Unknown',
+            'supplement_name': supplement_name or 'Unknown',
             'dosage_taken': intake.dosage_taken,
             'taken_at': intake.taken_at.isoformat(),
+            'local_date': intake.local_date.isoformat(),
             'notes': intake.notes,
-            'photo_confirmation': intake.photo_confirmation
+            'photo_confirmation': intake.photo_confirmation,
+            'photo_thumb': intake.photo_thumb,
+            'photo_medium': intake.photo_medium,
+            'photo_reuse_of': intake.photo_reuse_of
         })
     
-    return jsonify(result), 200
\ No newline at end of file
+    return jsonify({
+        'member_id': member_id,
+        'intakes': result,
+        'next_cursor': next_cursor
+    }), 200
\ No newline at end of file
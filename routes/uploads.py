@@ -0,0 +1,90 @@
+from flask import Blueprint, jsonify, current_app, send_from_directory, redirect, abort
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+import os
+import re
+from werkzeug.utils import secure_filename
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# Uploaded blobs are content-addressed and never rewritten, so clients may cache them for a year
+UPLOAD_MAX_AGE = 365 * 24 * 60 * 60
+
+# Lifetime of the presigned URLs handed out when blobs live in object storage
+UPLOAD_URL_EXPIRY = 60 * 60
+
+# Photo confirmations saved before content-addressed storage: supplements/<user_id>_<intake_id>_<timestamp>.<ext>
+LEGACY_PHOTO_PATTERN = re.compile(r'^(\d+)_(\d+)_')
+
+# Helper function to send a stored upload. Local blobs go out through send_file (zero-copy with
+# USE_X_SENDFILE or a server whose wsgi.file_wrapper uses sendfile), or through nginx when
+# UPLOADS_ACCEL_REDIRECT is set; Range and conditional requests work either way. Blobs in object
+# storage are redirected to a presigned URL.
+def send_upload(key, private=False):
+    storage = current_app.storage
+    local_path = storage.local_path(key)
+
+    if local_path is None:
+        if not storage.exists(key):
+            abort(404)
+        response = redirect(storage.url(key, UPLOAD_URL_EXPIRY))
+        # The redirect must not outlive the URL it points to
+        response.cache_control.max_age = UPLOAD_URL_EXPIRY // 2
+        response.cache_control.private = True
+        return response
+
+    if not os.path.isfile(local_path):
+        abort(404)
+
+    accel_prefix = current_app.config.get('UPLOADS_ACCEL_REDIRECT')
+    if accel_prefix:
+        response = current_app.response_class(status=200)
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{key}"
+    else:
+        response = send_from_directory(storage.root, key, conditional=True, etag=True, max_age=UPLOAD_MAX_AGE)
+
+    response.cache_control.max_age = UPLOAD_MAX_AGE
+    response.cache_control.immutable = True
+    if private:
+        # send_file marks conditional responses public; photo confirmations must stay out of shared caches
+        response.cache_control.public = False
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    return response
+
+# Serve supplement images and photo confirmations
+@uploads_bp.route('/<path:key>', methods=['GET'])
+def serve_upload(key):
+    parts = key.split('/')
+    if any(part != secure_filename(part) for part in parts):
+        return jsonify({'error': 'File not found'}), 404
+
+    # Photo confirmations live under confirmations/<user_id>/ and only their owner may read them
+    if parts[0] == 'confirmations' and len(parts) == 3:
+        verify_jwt_in_request()
+        if parts[1] != str(int(get_jwt_identity())):
+            return jsonify({'error': 'Unauthorized access to photo confirmation'}), 403
+        return send_upload(key, private=True)
+
+    if parts[0] != 'supplements' or len(parts) != 2:
+        return jsonify({'error': 'File not found'}), 404
+
+    legacy_photo = LEGACY_PHOTO_PATTERN.match(parts[1])
+    if legacy_photo:
+        verify_jwt_in_request()
+        current_user = int(get_jwt_identity())
+        SupplementIntake = current_app.config.get('SupplementIntake')
+
+        owner_id, intake_id = (int(group) for group in legacy_photo.groups())
+        if owner_id != current_user:
+            return jsonify({'error': 'Unauthorized access to photo confirmation'}), 403
+
+        intake = SupplementIntake.query.get(intake_id)
+        photo_files = (intake.photo_confirmation, intake.photo_thumb, intake.photo_medium) if intake else ()
+        if not intake or intake.user_id != current_user or parts[1] not in photo_files:
+            return jsonify({'error': 'Unauthorized access to photo confirmation'}), 403
+
+        return send_upload(key, private=True)
+
+    # Supplement images are public
+    return send_upload(key)
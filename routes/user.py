@@ -2,6 +2,8 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from main import db  # Only import db from main
+from utils.timezones import is_valid_timezone
+from utils.compliance_cache import invalidate_household
 
 user_bp = Blueprint('user', __name__)
 
@@ -19,7 +21,8 @@ def get_profile():
             'id': user.id,
             'name': user.name,
             'email': user.email,
-            'verified': user.verified
+            'verified': user.verified,
+            'timezone': user.timezone
         }), 200
     return jsonify({'error': 'User not found'}), 404
 
@@ -34,14 +37,23 @@ def update_profile():
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
+    timezone = data.get('timezone', user.timezone)
+    if not is_valid_timezone(timezone):
+        return jsonify({'error': 'Invalid timezone. Use an IANA name such as Europe/London'}), 400
+    
     user.name = data.get('name', user.name)
     user.email = data.get('email', user.email)
+    # Only intakes logged from now on are bucketed in the new timezone
+    user.timezone = timezone
     db.session.commit()
+    # The leaderboard shows the user's name
+    invalidate_household(current_app.compliance_cache, current_user)
     return jsonify({
         'id': user.id,
         'name': user.name,
         'email': user.email,
-        'verified': user.verified
+        'verified': user.verified,
+        'timezone': user.timezone
     }), 200
 
 # Invite Family Member Endpoint
@@ -60,6 +72,8 @@ def invite_family_member():
     family_member = FamilyMember(user_id=current_user, name=data['name'], email=data['email'], status='pending')
     db.session.add(family_member)
     db.session.commit()
+    # The household leaderboard lists every family member
+    invalidate_household(current_app.compliance_cache, current_user)
     return jsonify({
         'id': family_member.id,
         'user_id': family_member.user_id,
@@ -198,7 +198,7 @@ def get_supplement_history(token, member_id, start_date=None, end_date=None, sup
     response = requests.get(url, headers=headers, params=params)
     
     if response.status_code == 200:
-        history = response.json()
+        history = response.json()['intakes']
         print(f"Found {len(history)} history records:")
         for record in history[:5]:  # Show first 5 records
             print(f"  - {record['supplement_name']} at {record['taken_at']}")
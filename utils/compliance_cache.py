@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import threading
+import time
+
+# Each worker process keeps its own cache and writes only invalidate the cache of the worker
+# that served them, so every entry expires quickly: past periods still change when intakes are
+# deleted or synced late and when reminder schedules change.
+DEFAULT_TTL = 60
+
+
+def member_scope(member_id, is_family_member=False):
+    return ('family', int(member_id)) if is_family_member else ('user', int(member_id))
+
+
+def household_scope(user_id):
+    return ('household', int(user_id))
+
+
+def cache_key(scope, period, start_date, end_date):
+    return (scope, period, start_date, end_date)
+
+
+class ComplianceCache:
+    """Thread-safe LRU cache of compliance responses keyed by (scope, period, start_date, end_date)"""
+
+    def __init__(self, max_entries=1024, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, scope, day=None):
+        """Drop entries for a scope, or only those whose period contains day"""
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[0] == scope and (day is None or key[2] <= day <= key[3])
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+def invalidate_household(cache, user_id):
+    """Invalidate a user's cached leaderboards, e.g. after family members change"""
+    cache.invalidate(household_scope(user_id))
+
+
+def invalidate_member(cache, user_id, family_member_id=None, day=None):
+    """Invalidate cached compliance for a member and their household leaderboard"""
+    if family_member_id:
+        cache.invalidate(member_scope(family_member_id, True), day)
+    else:
+        cache.invalidate(member_scope(user_id, False), day)
+    cache.invalidate(household_scope(user_id), day)
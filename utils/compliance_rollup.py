@@ -0,0 +1,186 @@
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import case, func, update
+from main import db
+from utils.schedule import WeeklySchedule
+
+# Helpers that keep the daily_compliance rollup in step with intake and reminder writes.
+# They run inside the calling route's transaction, which commits them together with its own
+# changes. Taken doses are added with single UPDATE/upsert statements, so concurrent intakes
+# for the same member and day never overwrite each other's counts.
+
+
+def rollup_enabled():
+    return current_app.config.get('USE_COMPLIANCE_ROLLUP', False)
+
+
+def member_key(family_member_id):
+    """Rollup key of a household member: the family member id, or 0 for the account holder.
+    Unlike the nullable family_member_id it takes part in the unique (user, member, date) key."""
+    return family_member_id or 0
+
+
+def _member_rows(user_id, family_member_id):
+    DailyCompliance = current_app.config.get('DailyCompliance')
+    return DailyCompliance.query.filter(
+        DailyCompliance.user_id == user_id,
+        DailyCompliance.member_key == member_key(family_member_id)
+    )
+
+
+def _member_schedule(user_id, family_member_id):
+    from routes.compliance import get_member_schedule
+    if family_member_id:
+        return get_member_schedule(family_member_id, True)
+    return get_member_schedule(user_id, False)
+
+
+def _insert_or_add(table, values, taken_doses):
+    # INSERT that adds to taken_doses instead when another request created the day's row first
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table).values(values)
+        return statement.on_duplicate_key_update(taken_doses=taken_doses, updated_at=values['updated_at'])
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(table).values(values)
+    return statement.on_conflict_do_update(
+        index_elements=['user_id', 'member_key', 'date'],
+        set_={'taken_doses': taken_doses, 'updated_at': values['updated_at']}
+    )
+
+
+def apply_taken(user_id, family_member_id, taken_date, delta):
+    """Add delta taken doses to a member's rollup row for a day, creating the row if needed"""
+    DailyCompliance = current_app.config.get('DailyCompliance')
+    table = DailyCompliance.__table__
+
+    # Counts never drop below zero, even if the rollup was rebuilt after the intake was logged
+    taken_doses = case((table.c.taken_doses + delta < 0, 0), else_=table.c.taken_doses + delta)
+    result = db.session.execute(
+        update(table).where(
+            table.c.user_id == user_id,
+            table.c.member_key == member_key(family_member_id),
+            table.c.date == taken_date
+        ).values(taken_doses=taken_doses, updated_at=datetime.utcnow())
+    )
+    if result.rowcount:
+        return
+
+    # First dose of the day; the schedule is only read when the row has to be created
+    schedule = _member_schedule(user_id, family_member_id)
+    db.session.execute(_insert_or_add(table, {
+        'user_id': user_id,
+        'family_member_id': family_member_id,
+        'member_key': member_key(family_member_id),
+        'date': taken_date,
+        'scheduled_doses': schedule.count(taken_date, taken_date),
+        'taken_doses': max(delta, 0),
+        'updated_at': datetime.utcnow()
+    }, taken_doses))
+
+
+def apply_intake(intake, delta=1):
+    """Add (or with delta=-1, remove) an intake from its member's rollup row"""
+    apply_taken(intake.user_id, intake.family_member_id, intake.local_date, delta)
+
+
+def refresh_scheduled(user_id, family_member_id):
+    """Rewrite scheduled doses on a member's rollup rows after their reminders change"""
+    db.session.flush()
+    schedule = _member_schedule(user_id, family_member_id)
+    for row in _member_rows(user_id, family_member_id).all():
+        row.scheduled_doses = schedule.per_weekday[row.date.weekday()]
+
+
+def rebuild_rollup(chunk_size=100, echo=None):
+    """Rebuild the whole rollup from reminders and intakes, committing every chunk_size users"""
+    User = current_app.config.get('User')
+    Reminder = current_app.config.get('Reminder')
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    DailyCompliance = current_app.config.get('DailyCompliance')
+
+    today = date.today()
+    last_user_id = 0
+    total_rows = 0
+
+    while True:
+        user_ids = [row[0] for row in db.session.query(User.id).filter(
+            User.id > last_user_id
+        ).order_by(User.id).limit(chunk_size).all()]
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        # Weekly schedules and earliest reminder date per member
+        schedules = {}
+        first_dates = {}
+        reminder_rows = db.session.query(
+            Reminder.user_id, Reminder.family_member_id, Reminder.days_mask,
+            func.count(Reminder.id), func.min(Reminder.created_at)
+        ).filter(
+            Reminder.active == True,
+            Reminder.user_id.in_(user_ids)
+        ).group_by(Reminder.user_id, Reminder.family_member_id, Reminder.days_mask).all()
+        for user_id, family_member_id, days_mask, count, created_at in reminder_rows:
+            key = (user_id, family_member_id)
+            schedules.setdefault(key, WeeklySchedule()).add_mask(days_mask, count)
+            if created_at:
+                first_dates[key] = min(first_dates.get(key, today), created_at.date())
+
+        # Taken doses per member and local day
+        taken = {}
+        intake_rows = db.session.query(
+            SupplementIntake.user_id, SupplementIntake.family_member_id, SupplementIntake.local_date,
+            func.count(SupplementIntake.id)
+        ).filter(
+            SupplementIntake.user_id.in_(user_ids)
+        ).group_by(SupplementIntake.user_id, SupplementIntake.family_member_id, SupplementIntake.local_date).all()
+        for user_id, family_member_id, day, count in intake_rows:
+            key = (user_id, family_member_id)
+            taken.setdefault(key, {})[day] = count
+            first_dates[key] = min(first_dates.get(key, today), day)
+
+        rows = []
+        for key, first_date in first_dates.items():
+            schedule = schedules.get(key, WeeklySchedule())
+            member_taken = taken.get(key, {})
+            current_date = first_date
+            for day_scheduled in schedule.daily(first_date, max(today, max(member_taken, default=today))):
+                day_taken = member_taken.get(current_date, 0)
+                if day_scheduled or day_taken:
+                    rows.append({
+                        'user_id': key[0],
+                        'family_member_id': key[1],
+                        'member_key': member_key(key[1]),
+                        'date': current_date,
+                        'scheduled_doses': day_scheduled,
+                        'taken_doses': day_taken,
+                        'updated_at': datetime.utcnow()
+                    })
+                current_date += timedelta(days=1)
+
+        DailyCompliance.query.filter(DailyCompliance.user_id.in_(user_ids)).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(DailyCompliance.__table__.insert(), rows)
+        db.session.commit()
+
+        total_rows += len(rows)
+        if echo:
+            echo(f'Rebuilt users {user_ids[0]}-{user_ids[-1]}: {len(rows)} rows')
+
+    return total_rows
+
+
+@click.command('rebuild-compliance-rollup')
+@click.option('--chunk-size', default=100, show_default=True, help='Number of users rebuilt per transaction.')
+@with_appcontext
+def rebuild_compliance_rollup_command(chunk_size):
+    """Backfill the daily_compliance rollup table from reminders and intakes."""
+    total_rows = rebuild_rollup(chunk_size=chunk_size, echo=click.echo)
+    click.echo(f'Daily compliance rollup rebuilt: {total_rows} rows')
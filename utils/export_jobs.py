@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import json
+import os
+import threading
+import uuid
+from flask import current_app
+from main import db
+
+# Local worker pool for compliance export jobs. Jobs are tracked in the export_jobs table and
+# artifacts are written under EXPORT_JOBS_DIR, so no external broker is needed. A job whose
+# worker process restarted never finishes; jobs still queued or running EXPORT_JOB_TIMEOUT
+# seconds after they were created are marked failed when jobs are next submitted or read.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('EXPORT_JOB_WORKERS', 2),
+                thread_name_prefix='export-job'
+            )
+        return _executor
+
+
+def exports_dir(app):
+    path = app.config.get('EXPORT_JOBS_DIR') or os.path.join(app.root_path, 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def submit_export_job(user_id, format_type, params, filename):
+    """Record a queued export job and hand it to the worker pool"""
+    ExportJob = current_app.config.get('ExportJob')
+    app = current_app._get_current_object()
+
+    clean_up_jobs()
+
+    job = ExportJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        status='queued',
+        format=format_type,
+        params=json.dumps(params),
+        filename=filename
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    _get_executor(app).submit(run_export_job, app, job.id)
+    return job
+
+
+def run_export_job(app, job_id):
+    """Write a job's report to disk; runs on a worker thread"""
+    from routes.compliance import iter_report_stream
+
+    with app.app_context():
+        ExportJob = app.config.get('ExportJob')
+        job = ExportJob.query.get(job_id)
+        if job is None:
+            return
+        job.status = 'running'
+        db.session.commit()
+
+        params = json.loads(job.params)
+        artifact_path = os.path.join(exports_dir(app), f'{job.id}.{job.format}')
+        temp_path = f'{artifact_path}.part'
+        try:
+            with open(temp_path, 'w', newline='', encoding='utf-8') as artifact:
+                for chunk in iter_report_stream(
+                    params['member_id'],
+                    params['member_name'],
+                    params['period'],
+                    job.format,
+                    datetime.strptime(params['start_date'], '%Y-%m-%d').date(),
+                    datetime.strptime(params['end_date'], '%Y-%m-%d').date(),
+                    params['is_family_member']
+                ):
+                    artifact.write(chunk)
+            os.replace(temp_path, artifact_path)
+        except Exception as e:
+            db.session.rollback()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            job.status = 'failed'
+            job.error = str(e)
+        else:
+            job.status = 'finished'
+            job.artifact_path = artifact_path
+        job.finished_at = datetime.utcnow()
+        job.expires_at = job.finished_at + timedelta(seconds=app.config.get('EXPORT_JOB_TTL', 24 * 60 * 60))
+        db.session.commit()
+
+
+def fail_stale_jobs():
+    """Mark jobs that outlived EXPORT_JOB_TIMEOUT while queued or running as failed"""
+    ExportJob = current_app.config.get('ExportJob')
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config.get('EXPORT_JOB_TIMEOUT', 60 * 60))
+    stale = ExportJob.query.filter(
+        ExportJob.status.in_(['queued', 'running']),
+        ExportJob.created_at < cutoff
+    ).all()
+    for job in stale:
+        job.status = 'failed'
+        job.error = 'Export job was interrupted before it finished'
+        job.finished_at = now
+        job.expires_at = now + timedelta(seconds=current_app.config.get('EXPORT_JOB_TTL', 24 * 60 * 60))
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+def clean_up_jobs():
+    """Fail interrupted jobs and purge expired ones"""
+    fail_stale_jobs()
+    purge_expired_jobs()
+
+
+def purge_expired_jobs():
+    """Delete expired jobs and their artifacts"""
+    ExportJob = current_app.config.get('ExportJob')
+
+    expired = ExportJob.query.filter(ExportJob.expires_at < datetime.utcnow()).all()
+    for job in expired:
+        if job.artifact_path and os.path.exists(job.artifact_path):
+            os.remove(job.artifact_path)
+        db.session.delete(job)
+    if expired:
+        db.session.commit()
+    return len(expired)
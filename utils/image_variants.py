@@ -0,0 +1,169 @@
+from concurrent.futures import ProcessPoolExecutor
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from PIL import Image, ImageOps
+from sqlalchemy import update
+from main import db
+from utils.storage import create_storage, stage_file, store_file
+
+# Post-upload image pipeline. Originals are re-encoded without EXIF/GPS metadata and resized
+# WebP variants are stored next to them as <stem>_<variant>.webp. The work runs in a process
+# pool so upload requests return as soon as the original is saved; the stripped original's
+# key and the variant names are written to the uploaded row when they are ready. Blobs are
+# content-addressed and served as immutable, so the stripped original is stored under the
+# hash of its own bytes and no existing key is ever rewritten; the uploaded original, which
+# still carries its metadata, is deleted once no row points at it.
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each variant
+IMAGE_VARIANTS = {'thumb': 256, 'medium': 1024}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 90
+
+ALLOWED_IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers do not inherit the server's threads, locks or database connections
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config.get('IMAGE_VARIANT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def image_extension(filename):
+    """Lower-case extension of an uploaded filename, or None if it is not an accepted image type"""
+    extension = os.path.splitext(filename or '')[1].lstrip('.').lower()
+    return extension if extension in ALLOWED_IMAGE_EXTENSIONS else None
+
+
+def variant_key(key, variant):
+    return f'{os.path.splitext(key)[0]}_{variant}.webp'
+
+
+def _encode(storage, image, **params):
+    """Encode image into a new staging file and return its path"""
+    temp_file, temp_path = stage_file(storage)
+    try:
+        with temp_file:
+            image.save(temp_file, **params)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def make_variants(settings, key):
+    """Store a metadata-free copy of a stored original and its variants; runs in a worker process.
+    Returns {'original': key of the copy, variant: key}."""
+    storage = create_storage(settings)
+    with storage.open(key) as source:
+        data = source.read()
+
+    with Image.open(io.BytesIO(data)) as original:
+        image_format = original.format
+        # Keep the colour profile; everything else (EXIF, GPS, XMP, comments) is dropped
+        icc_params = {'icc_profile': original.info['icc_profile']} if original.info.get('icc_profile') else {}
+        # Apply the EXIF orientation to the pixels before the EXIF block goes
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+
+    if image_format == 'JPEG':
+        temp_path = _encode(storage, image.convert('RGB'), format='JPEG', quality=JPEG_QUALITY, optimize=True, **icc_params)
+    else:
+        temp_path = _encode(storage, image, format=image_format, **icc_params)
+    prefix, filename = key.rsplit('/', 1)
+    try:
+        stripped_key = store_file(storage, temp_path, prefix, os.path.splitext(filename)[1].lstrip('.'))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    # Variants are derived from the stripped original's key, so existing ones already hold
+    # these exact images
+    variants = {'original': stripped_key}
+    for variant, size in IMAGE_VARIANTS.items():
+        variants[variant] = variant_key(stripped_key, variant)
+        if storage.exists(variants[variant]):
+            storage.touch(variants[variant])
+            continue
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        temp_path = _encode(storage, resized, format='WEBP', quality=WEBP_QUALITY, method=4, **icc_params)
+        try:
+            storage.put_file(variants[variant], temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return variants
+
+
+def _write_image_columns(Model, record_id, image_column, image_value, values):
+    # Skip the row if a newer upload replaced the image while this one was processing
+    db.session.execute(
+        update(Model)
+        .where(Model.id == record_id, getattr(Model, image_column) == image_value)
+        .values(values)
+    )
+    db.session.commit()
+
+
+def _delete_unreferenced_original(app, key):
+    # Identical uploads share a blob, so another row may still be waiting for its own variants
+    Supplement = app.config.get('Supplement')
+    SupplementIntake = app.config.get('SupplementIntake')
+    referenced = db.session.query(Supplement.id).filter(Supplement.image_url == '/uploads/' + key).first() or \
+        db.session.query(SupplementIntake.id).filter(SupplementIntake.photo_confirmation == key).first()
+    if not referenced:
+        app.storage.delete(key)
+
+
+def submit_image_variants(model_name, record_id, image_column, variant_columns, key, url_prefix=''):
+    """Queue metadata stripping and variant generation for a stored original. When it finishes,
+    image_column gets url_prefix + the stripped original's key and each column in variant_columns
+    ({variant: column}) gets url_prefix + the variant's key, as long as image_column still holds
+    url_prefix + key. Call after the upload is committed."""
+    from flask import current_app
+    app = current_app._get_current_object()
+    image_value = url_prefix + key
+
+    future = _get_executor(app).submit(make_variants, app.storage.settings, key)
+    future.add_done_callback(
+        lambda done: _record_variants(app, model_name, record_id, image_column, image_value, variant_columns, url_prefix, done)
+    )
+    return future
+
+
+def _record_variants(app, model_name, record_id, image_column, image_value, variant_columns, url_prefix, future):
+    """Write finished variant keys to the uploaded row; runs on the pool's callback thread"""
+    try:
+        variants = future.result()
+    except Exception:
+        logger.exception('Image variants failed for %s %s', model_name, record_id)
+        return
+
+    with app.app_context():
+        values = {column: url_prefix + variants[variant] for variant, column in variant_columns.items()}
+        values[image_column] = url_prefix + variants['original']
+        try:
+            _write_image_columns(app.config.get(model_name), record_id, image_column, image_value, values)
+            if variants['original'] != image_value[len(url_prefix):]:
+                _delete_unreferenced_original(app, image_value[len(url_prefix):])
+        except Exception:
+            db.session.rollback()
+            logger.exception('Could not record image variants for %s %s', model_name, record_id)
+        finally:
+            db.session.remove()
@@ -0,0 +1,203 @@
+from contextlib import nullcontext
+from datetime import timedelta
+import shutil
+import tempfile
+import threading
+from flask import current_app
+from PIL import Image, ImageOps
+from main import db
+
+# Perceptual hashes of photo confirmations, used to spot the same photo being submitted for
+# several doses. Each photo gets a 64-bit difference hash (dHash), stored as 16 hex digits on
+# the intake; re-encoded, resized or lightly edited copies land within a few bits of each other.
+# Hashes are indexed in memory in one BK-tree per user, so a lookup only visits the part of the
+# tree that can be within REUSE_MAX_DISTANCE bits. Each process loads the index from the
+# database on its first lookup (not at startup, so `flask db` commands work before the hash
+# column exists) and catches up on photos stored by other processes through the intakes'
+# (user_id, updated_at) index before every lookup. Database reads happen outside the index
+# lock, which only guards the in-memory trees.
+
+# dHash grid: HASH_SIZE rows of HASH_SIZE comparisons = 64 bits
+HASH_SIZE = 8
+
+# Photos whose hashes differ in at most this many bits are treated as the same picture
+REUSE_MAX_DISTANCE = 6
+
+# Catch-up re-reads this much history before a user's watermark, covering rows committed late
+# or stamped by a server whose clock runs behind; re-adding a known photo is a no-op
+CATCH_UP_OVERLAP = timedelta(minutes=5)
+
+# Photos read from non-seekable streams (S3 bodies) are spooled to disk above this size
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _seekable(image_file):
+    # Pillow needs to seek; spool streams that cannot, without holding large photos in memory
+    if image_file.seekable():
+        return nullcontext(image_file)
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    shutil.copyfileobj(image_file, spool, 64 * 1024)
+    spool.seek(0)
+    return spool
+
+
+def photo_hash(image_file):
+    """dHash of an image file object as an int, or None if it cannot be decoded"""
+    try:
+        with _seekable(image_file) as source, Image.open(source) as image:
+            # JPEGs are decoded at a reduced scale, which is most of the cost for phone photos
+            image.draft('L', (HASH_SIZE * 16, HASH_SIZE * 16))
+            image = ImageOps.exif_transpose(image)
+            pixels = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS).tobytes()
+    except (OSError, ValueError):
+        return None
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def format_hash(value):
+    return f'{value:016x}'
+
+
+class BKTree:
+    """BK-tree over 64-bit hashes with Hamming distance. Nodes are [hash, item ids, {distance: child}]."""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = [value, {item}, {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].add(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, {item}, {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """(distance, item) for every item within max_distance of value"""
+        results = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            # Triangle inequality: only children at distance +/- max_distance can hold matches
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        return results
+
+
+def _add_rows(trees, synced, rows):
+    """Index (user_id, intake_id, photo_phash, updated_at) rows, moving each user's watermark"""
+    for user_id, intake_id, photo_phash, updated_at in rows:
+        trees.setdefault(user_id, BKTree()).add(int(photo_phash, 16), intake_id)
+        if updated_at and (synced.get(user_id) is None or updated_at > synced[user_id]):
+            synced[user_id] = updated_at
+
+
+class PhotoHashIndex:
+    """Per-user BK-trees of intake photo hashes"""
+
+    def __init__(self):
+        self._trees = {}
+        self._synced = {}  # user_id -> newest intake updated_at loaded for that user
+        self._rebuilt_at = None  # newest intake updated_at when rebuild() ran; None loads each user in full
+        self._built = False
+        self._lock = threading.Lock()  # guards the trees and watermarks
+        self._build_lock = threading.Lock()  # lets one thread load the index while the others wait
+
+    def rebuild(self, batch_size=10000):
+        """Load every stored photo hash"""
+        SupplementIntake = current_app.config.get('SupplementIntake')
+
+        # Read the watermark first, so photos stored during the load are caught up later
+        rebuilt_at = db.session.query(db.func.max(SupplementIntake.updated_at)).scalar()
+        query = db.session.query(
+            SupplementIntake.user_id, SupplementIntake.id, SupplementIntake.photo_phash, SupplementIntake.updated_at
+        ).filter(SupplementIntake.photo_phash.isnot(None))
+
+        trees = {}
+        synced = {}
+        loaded = 0
+        for row in query.yield_per(batch_size):
+            _add_rows(trees, synced, [row])
+            loaded += 1
+
+        with self._lock:
+            self._trees = trees
+            self._synced = synced
+            # Users without photos yet are caught up from this point
+            self._rebuilt_at = rebuilt_at
+            self._built = True
+        return loaded
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._build_lock:
+            if not self._built:
+                self.rebuild()
+
+    def _catch_up(self, user_id):
+        # Photos stored by other processes since this one last looked at the user
+        SupplementIntake = current_app.config.get('SupplementIntake')
+
+        with self._lock:
+            since = self._synced.get(user_id, self._rebuilt_at)
+        query = db.session.query(
+            SupplementIntake.user_id, SupplementIntake.id, SupplementIntake.photo_phash, SupplementIntake.updated_at
+        ).filter(SupplementIntake.user_id == user_id, SupplementIntake.photo_phash.isnot(None))
+        if since is not None:
+            query = query.filter(SupplementIntake.updated_at >= since - CATCH_UP_OVERLAP)
+        rows = query.all()
+
+        with self._lock:
+            _add_rows(self._trees, self._synced, rows)
+            self._synced.setdefault(user_id, since)
+
+    def add(self, user_id, intake_id, value):
+        with self._lock:
+            self._trees.setdefault(user_id, BKTree()).add(value, intake_id)
+
+    def find_similar(self, user_id, value, exclude_intake_id=None, max_distance=REUSE_MAX_DISTANCE):
+        """Ids of the user's other intakes whose photo is within max_distance of value, closest first"""
+        SupplementIntake = current_app.config.get('SupplementIntake')
+
+        self._ensure_built()
+        self._catch_up(user_id)
+        with self._lock:
+            tree = self._trees.get(user_id)
+            candidates = tree.search(value, max_distance) if tree else []
+        candidate_ids = {intake_id for _, intake_id in candidates if intake_id != exclude_intake_id}
+        if not candidate_ids:
+            return []
+
+        # The tree never forgets; drop intakes deleted or re-photographed since they were indexed
+        rows = db.session.query(SupplementIntake.id, SupplementIntake.photo_phash).filter(
+            SupplementIntake.id.in_(candidate_ids),
+            SupplementIntake.user_id == user_id,
+            SupplementIntake.photo_phash.isnot(None)
+        ).all()
+        matches = sorted(
+            (hamming(value, int(photo_phash, 16)), intake_id) for intake_id, photo_phash in rows
+        )
+        return [intake_id for distance, intake_id in matches if distance <= max_distance]
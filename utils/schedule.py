@@ -0,0 +1,76 @@
+from functools import lru_cache
+
+# Weekday names in date.weekday() order (Monday == 0)
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Accepted day spellings (full and three-letter names, any case) -> weekday number
+DAY_LOOKUP = {name.lower(): weekday for weekday, name in enumerate(WEEKDAY_NAMES)}
+DAY_LOOKUP.update({name[:3].lower(): weekday for weekday, name in enumerate(WEEKDAY_NAMES)})
+
+# Mask with every weekday set
+ALL_DAYS_MASK = 0b1111111
+
+
+@lru_cache(maxsize=256)
+def parse_days(days, strict=False):
+    """Parse a days string such as 'Mon,Tue' or 'Monday,Tuesday' into a 7-bit weekday mask (bit 0 == Monday)"""
+    if not days:
+        return 0
+    mask = 0
+    for token in days.split(','):
+        token = token.strip().lower()
+        if not token:
+            continue
+        weekday = DAY_LOOKUP.get(token)
+        if weekday is None:
+            if strict:
+                raise ValueError(f'Unknown day: {token}')
+            continue
+        mask |= 1 << weekday
+    return mask
+
+
+def format_days(mask):
+    """Format a weekday mask as short day names, e.g. 'Mon,Wed,Fri'"""
+    return ','.join(name[:3] for weekday, name in enumerate(WEEKDAY_NAMES) if mask & (1 << weekday))
+
+
+def due_on(mask_column, day):
+    """SQL predicate that is true when a weekday mask column includes day's weekday"""
+    return mask_column.op('&')(1 << day.weekday()) != 0
+
+
+class WeeklySchedule:
+    """Number of scheduled doses for each weekday, built from reminder weekday masks"""
+
+    def __init__(self, per_weekday=None):
+        self.per_weekday = list(per_weekday) if per_weekday else [0] * 7
+
+    def add_mask(self, mask, doses=1):
+        for weekday in range(7):
+            if mask & (1 << weekday):
+                self.per_weekday[weekday] += doses
+
+    @property
+    def per_week(self):
+        return sum(self.per_weekday)
+
+    def count(self, start_date, end_date):
+        """Scheduled doses between start_date and end_date (inclusive)"""
+        if end_date < start_date:
+            return 0
+        total_days = (end_date - start_date).days + 1
+        weeks, remainder = divmod(total_days, 7)
+        first_weekday = start_date.weekday()
+        count = weeks * self.per_week
+        for offset in range(remainder):
+            count += self.per_weekday[(first_weekday + offset) % 7]
+        return count
+
+    def daily(self, start_date, end_date):
+        """Per-day scheduled doses from start_date to end_date (inclusive)"""
+        if end_date < start_date:
+            return []
+        first_weekday = start_date.weekday()
+        total_days = (end_date - start_date).days + 1
+        return [self.per_weekday[(first_weekday + offset) % 7] for offset in range(total_days)]
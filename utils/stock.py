@@ -0,0 +1,36 @@
+from sqlalchemy import case, func, update
+from main import db
+
+# Atomic stock changes for any model with an integer `id` and a stock column
+# (Supplement.stock_level, Product.stock). Each change is a single conditional UPDATE,
+# so concurrent writers cannot lose each other's decrements. Call these as late as
+# possible before committing: the UPDATE holds the row lock until the commit.
+
+
+def _stock_level(column, record_id):
+    model = column.class_
+    return db.session.query(column).filter(model.id == record_id).scalar()
+
+
+def decrement_stock(column, record_id, quantity=1):
+    """Take up to quantity units from a row's stock, never going below 0, and return the new level"""
+    model = column.class_
+    db.session.execute(
+        update(model)
+        .where(model.id == record_id, column > 0)
+        .values({column: case((column > quantity, column - quantity), else_=0)})
+        .execution_options(synchronize_session=False)
+    )
+    return _stock_level(column, record_id)
+
+
+def increment_stock(column, record_id, quantity):
+    """Add quantity units to a row's stock and return the new level"""
+    model = column.class_
+    db.session.execute(
+        update(model)
+        .where(model.id == record_id)
+        .values({column: func.coalesce(column, 0) + quantity})
+        .execution_options(synchronize_session=False)
+    )
+    return _stock_level(column, record_id)
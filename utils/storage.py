@@ -0,0 +1,202 @@
+import hashlib
+import os
+import tempfile
+
+# Content-addressed blob storage for uploads. Keys are '/'-separated paths such as
+# supplements/<sha256>.jpg or confirmations/<user_id>/<sha256>.jpg, where the hash is taken
+# over the uploaded bytes, so identical uploads share one blob. Uploads are streamed to a
+# staging file while they are hashed and then moved into place in one step. The driver is
+# chosen by STORAGE_DRIVER: 'local' (UPLOADS_DIR) or 's3' (any S3-compatible service).
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StorageDriver:
+    """Interface implemented by the storage drivers"""
+
+    # Local directory for partially written files
+    staging_dir = None
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def put_file(self, key, source_path):
+        """Move a finished local file to key; the source file is consumed"""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Readable binary file object for key"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def touch(self, key):
+        """Mark an existing blob as just used, so orphan reclamation's grace period covers it"""
+
+    def local_path(self, key):
+        """Filesystem path of key when the driver keeps blobs on local disk, otherwise None"""
+        return None
+
+    def url(self, key, expires_in):
+        """Temporary direct download URL for key, or None if the app must serve it"""
+        return None
+
+
+class LocalStorage(StorageDriver):
+    """Blobs stored as files under a root directory"""
+
+    def __init__(self, root):
+        self.root = root
+        # Staged on the same filesystem so os.replace can move files into place atomically
+        self.staging_dir = os.path.join(root, '.staging')
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def put_file(self, key, source_path):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key):
+        return self._path(key)
+
+
+class S3Storage(StorageDriver):
+    """Blobs stored in an S3 bucket; endpoint_url points it at MinIO or another compatible service"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, staging_dir=None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError('The s3 storage driver requires boto3 (pip install boto3)')
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.staging_dir = staging_dir or tempfile.gettempdir()
+        # Credentials come from the usual AWS environment variables or config files
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def _object_key(self, key):
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def put_file(self, key, source_path):
+        try:
+            self.client.upload_file(source_path, self.bucket, self._object_key(key))
+        finally:
+            os.remove(source_path)
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))['Body']
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def url(self, key, expires_in):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._object_key(key)},
+            ExpiresIn=expires_in
+        )
+
+
+def storage_settings(app):
+    """Plain dict describing the app's storage driver; picklable, so worker processes can rebuild it"""
+    driver = app.config.get('STORAGE_DRIVER') or 'local'
+    if driver == 's3':
+        return {
+            'driver': 's3',
+            'bucket': app.config.get('S3_BUCKET'),
+            'prefix': app.config.get('S3_PREFIX') or '',
+            'endpoint_url': app.config.get('S3_ENDPOINT_URL'),
+            'region': app.config.get('S3_REGION'),
+        }
+    if driver == 'local':
+        return {
+            'driver': 'local',
+            'root': app.config.get('UPLOADS_DIR') or os.path.join(app.root_path, 'uploads'),
+        }
+    raise ValueError(f'Unknown STORAGE_DRIVER: {driver}')
+
+
+def create_storage(settings):
+    """Build a driver from storage_settings()"""
+    options = {name: value for name, value in settings.items() if name != 'driver'}
+    storage = S3Storage(**options) if settings['driver'] == 's3' else LocalStorage(**options)
+    storage.settings = settings
+    return storage
+
+
+def stage_file(storage):
+    """Open a new staging file for writing; returns (file, path)"""
+    os.makedirs(storage.staging_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=storage.staging_dir, suffix='.part')
+    return os.fdopen(fd, 'wb'), temp_path
+
+
+def _put_blob(storage, key, temp_path):
+    # Content addressing makes an existing blob identical to the staged one
+    if storage.exists(key):
+        os.remove(temp_path)
+        storage.touch(key)
+    else:
+        storage.put_file(key, temp_path)
+
+
+def store_upload(storage, stream, prefix, extension):
+    """Stream an upload into storage as <prefix>/<sha256>.<extension> and return the key.
+    If the blob already exists the staged copy is discarded."""
+    digest = hashlib.sha256()
+    temp_file, temp_path = stage_file(storage)
+    try:
+        with temp_file:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                temp_file.write(chunk)
+        key = f'{prefix}/{digest.hexdigest()}.{extension}'
+        _put_blob(storage, key, temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return key
+
+
+def store_file(storage, path, prefix, extension):
+    """Move a finished local file into storage as <prefix>/<sha256>.<extension> and return the key.
+    The file is consumed."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    key = f'{prefix}/{digest.hexdigest()}.{extension}'
+    _put_blob(storage, key, path)
+    return key
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import current_app
+from main import db
+
+# Timestamps are stored as naive UTC; day buckets (intake local_date, compliance periods,
+# "today") are taken in the account owner's timezone. Family members share it.
+
+DEFAULT_TIMEZONE = 'UTC'
+
+
+@lru_cache(maxsize=512)
+def get_zone(name):
+    """ZoneInfo for an IANA name such as 'Asia/Karachi', or None if it is unknown"""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def is_valid_timezone(name):
+    # get_zone is cached, so only strings can be looked up
+    return isinstance(name, str) and bool(name) and get_zone(name) is not None
+
+
+def local_date(utc_datetime, tz_name):
+    """Calendar date of a naive UTC datetime in the given timezone"""
+    zone = get_zone(tz_name) or get_zone(DEFAULT_TIMEZONE)
+    return utc_datetime.replace(tzinfo=timezone.utc).astimezone(zone).date()
+
+
+def local_today(tz_name):
+    return local_date(datetime.utcnow(), tz_name)
+
+
+def user_timezone(user_id):
+    """Timezone name stored for a user"""
+    User = current_app.config.get('User')
+    tz_name = db.session.query(User.timezone).filter(User.id == user_id).scalar()
+    return tz_name or DEFAULT_TIMEZONE
+
+
+def user_today(user_id):
+    """Today's date for a user (and their family members)"""
+    return local_today(user_timezone(user_id))
@@ -0,0 +1,61 @@
+from datetime import timedelta
+import numpy as np
+
+# Vectorized compliance trend calculations over per-day scheduled/taken arrays.
+# Every function takes arrays aligned to consecutive days starting at start_date.
+
+
+def rates(scheduled, taken):
+    """Compliance rate (%) element-wise, 0 where nothing is scheduled"""
+    scheduled = np.asarray(scheduled, dtype=np.float64)
+    taken = np.asarray(taken, dtype=np.float64)
+    return np.divide(taken * 100, scheduled, out=np.zeros_like(taken), where=scheduled > 0)
+
+
+def rolling_sum(values, window):
+    """Trailing sum over `window` days; the first days use the days available so far"""
+    sums = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return sums[ends] - sums[starts]
+
+
+def rolling_rates(scheduled, taken, window):
+    """Trailing compliance rate over `window` days"""
+    return rates(rolling_sum(scheduled, window), rolling_sum(taken, window))
+
+
+def streaks(scheduled, taken):
+    """Current and longest run of fully-taken days, ignoring days with nothing scheduled"""
+    scheduled = np.asarray(scheduled)
+    taken = np.asarray(taken)
+    complete = (taken >= scheduled)[scheduled > 0]
+    if complete.size == 0:
+        return {'current': 0, 'longest': 0}
+
+    # Positions of missed days bound the runs of complete days
+    breaks = np.concatenate(([-1], np.flatnonzero(~complete), [complete.size]))
+    runs = np.diff(breaks) - 1
+    return {'current': int(runs[-1]), 'longest': int(runs.max())}
+
+
+def resample(start_date, scheduled, taken, period):
+    """Sum days into calendar weeks (Monday start) or months, returning (period_start, scheduled, taken) rows"""
+    days = len(scheduled)
+    if days == 0:
+        return []
+
+    dates = np.datetime64(start_date, 'D') + np.arange(days)
+    if period == 'weekly':
+        # Week number counted from Monday 1969-12-29 (the epoch is a Thursday)
+        keys = (dates.astype(np.int64) + 3) // 7
+    else:
+        keys = dates.astype('datetime64[M]').astype(np.int64)
+    boundaries = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+
+    scheduled_sums = np.add.reduceat(np.asarray(scheduled, dtype=np.int64), boundaries)
+    taken_sums = np.add.reduceat(np.asarray(taken, dtype=np.int64), boundaries)
+    return [
+        (start_date + timedelta(days=int(offset)), int(scheduled_sum), int(taken_sum))
+        for offset, scheduled_sum, taken_sum in zip(boundaries, scheduled_sums, taken_sums)
+    ]
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import tempfile
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from main import db
+
+# Reclaims blobs in local upload storage that no row references any more: replaced supplement
+# images, photos of deleted intakes and their variants. Referenced keys are streamed from the
+# database in keyset batches into an on-disk SQLite index, and the uploads directory is walked
+# with os.scandir, so memory stays bounded however many rows and files there are. Files younger
+# than the grace period are kept: uploads are stored before the row that references them is
+# committed, and reused blobs are touched on every dedup hit.
+
+QUARANTINE_DIR = '.quarantine'
+
+
+def reference_key(value):
+    """Storage key for a stored image reference, or None for external URLs"""
+    if not value:
+        return None
+    if value.startswith('/uploads/'):
+        return value[len('/uploads/'):]
+    if '://' in value or value.startswith('/'):
+        return None
+    # Photo confirmations saved before content-addressed storage hold a bare filename
+    return value if '/' in value else f'supplements/{value}'
+
+
+def iter_reference_batches(batch_size):
+    """Yield lists of referenced storage keys, reading each table in id order"""
+    Supplement = current_app.config.get('Supplement')
+    SupplementIntake = current_app.config.get('SupplementIntake')
+    sources = [
+        (Supplement, [Supplement.image_url, Supplement.image_thumb_url, Supplement.image_medium_url],
+         Supplement.image_url.isnot(None)),
+        (SupplementIntake, [SupplementIntake.photo_confirmation, SupplementIntake.photo_thumb, SupplementIntake.photo_medium],
+         SupplementIntake.photo_confirmation.isnot(None)),
+    ]
+    for Model, columns, has_image in sources:
+        last_id = 0
+        while True:
+            rows = db.session.query(Model.id, *columns).filter(
+                has_image, Model.id > last_id
+            ).order_by(Model.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            keys = [reference_key(value) for row in rows for value in row[1:]]
+            yield [key for key in keys if key]
+
+
+def iter_stored_files(root):
+    """Yield (key, os.DirEntry) for every blob under root, skipping dot directories
+    (staging, upload sessions, quarantine)"""
+    pending = ['']
+    while pending:
+        prefix = pending.pop()
+        with os.scandir(os.path.join(root, prefix) if prefix else root) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                key = f'{prefix}/{entry.name}' if prefix else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(key)
+                elif entry.is_file(follow_symlinks=False):
+                    yield key, entry
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reclaim_orphaned_uploads(grace_seconds, delete=False, dry_run=False, batch_size=1000, echo=None):
+    """Quarantine (or delete) stored files that no row references and that are older than
+    grace_seconds. Returns counts of scanned, kept and reclaimed files and reclaimed bytes."""
+    storage = current_app.storage
+    root = getattr(storage, 'root', None)
+    if root is None:
+        raise RuntimeError('Upload reclamation walks the local uploads directory; use bucket lifecycle rules with s3 storage')
+
+    stats = {'scanned': 0, 'referenced': 0, 'recent': 0, 'reclaimed': 0, 'bytes': 0}
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = sqlite3.connect(os.path.join(index_dir, 'references.db'))
+        try:
+            index.execute('CREATE TABLE refs (key TEXT PRIMARY KEY) WITHOUT ROWID')
+            for keys in iter_reference_batches(batch_size):
+                index.executemany('INSERT OR IGNORE INTO refs (key) VALUES (?)', [(key,) for key in keys])
+            index.commit()
+            # The scan below can take a while; do not hold the app's connection open meanwhile
+            db.session.remove()
+            if echo:
+                echo(f"Indexed {index.execute('SELECT COUNT(*) FROM refs').fetchone()[0]} referenced keys")
+
+            cutoff = time.time() - grace_seconds
+            for batch in _batches(iter_stored_files(root), batch_size):
+                stats['scanned'] += len(batch)
+                placeholders = ','.join('?' * len(batch))
+                referenced = {row[0] for row in index.execute(
+                    f'SELECT key FROM refs WHERE key IN ({placeholders})', [key for key, _ in batch]
+                )}
+                for key, entry in batch:
+                    if key in referenced:
+                        stats['referenced'] += 1
+                        continue
+                    try:
+                        # Stat now rather than at listing time, so a blob touched meanwhile is kept
+                        file_stat = os.stat(entry.path)
+                    except FileNotFoundError:
+                        continue
+                    if file_stat.st_mtime > cutoff:
+                        stats['recent'] += 1
+                        continue
+
+                    stats['reclaimed'] += 1
+                    stats['bytes'] += file_stat.st_size
+                    if dry_run:
+                        continue
+                    if delete:
+                        os.remove(entry.path)
+                    else:
+                        quarantine_path = os.path.join(root, QUARANTINE_DIR, *key.split('/'))
+                        os.makedirs(os.path.dirname(quarantine_path), exist_ok=True)
+                        os.replace(entry.path, quarantine_path)
+                if echo:
+                    echo(f"Scanned {stats['scanned']} files, {stats['reclaimed']} unreferenced")
+        finally:
+            index.close()
+
+    return stats
+
+
+@click.command('reclaim-uploads')
+@click.option('--grace-hours', default=24, show_default=True, help='Keep unreferenced files younger than this.')
+@click.option('--delete', is_flag=True, help=f'Delete unreferenced files instead of moving them to {QUARANTINE_DIR}/.')
+@click.option('--dry-run', is_flag=True, help='Only report what would be reclaimed.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows and files handled per batch.')
+@with_appcontext
+def reclaim_uploads_command(grace_hours, delete, dry_run, batch_size):
+    """Quarantine or delete uploaded files that no supplement or intake references."""
+    stats = reclaim_orphaned_uploads(grace_hours * 60 * 60, delete=delete, dry_run=dry_run,
+                                     batch_size=batch_size, echo=click.echo)
+    action = 'Would reclaim' if dry_run else ('Deleted' if delete else 'Quarantined')
+    click.echo(f"{action} {stats['reclaimed']} files ({stats['bytes']} bytes); "
+               f"kept {stats['referenced']} referenced and {stats['recent']} recent of {stats['scanned']} scanned")
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+import os
+import uuid
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from main import db
+from utils.storage import CHUNK_SIZE
+
+# Resumable uploads for photo confirmations. Each session has a staging file on local disk
+# (UPLOAD_SESSIONS_DIR); clients PUT chunks at byte offsets, which are written straight into
+# that file, and resume from the session's `received` offset after a dropped connection. Every
+# request of a session must reach a server that sees the same directory. Sessions idle for
+# longer than UPLOAD_SESSION_TTL are purged with their staging files, when a new session is
+# created and by `flask purge-upload-sessions`.
+
+# Largest photo accepted through an upload session
+MAX_UPLOAD_SESSION_SIZE = 50 * 1024 * 1024
+
+# Chunk size suggested to clients; any size up to the remaining bytes is accepted
+RECOMMENDED_CHUNK_SIZE = 1024 * 1024
+
+
+class ChunkOutOfRange(Exception):
+    """A chunk would run past the session's declared size"""
+
+
+def sessions_dir(app):
+    path = app.config.get('UPLOAD_SESSIONS_DIR') or os.path.join(app.storage.staging_dir, 'sessions')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def session_path(app, session_id):
+    return os.path.join(sessions_dir(app), f'{session_id}.part')
+
+
+def session_expiry(app):
+    return datetime.utcnow() + timedelta(seconds=app.config.get('UPLOAD_SESSION_TTL', 24 * 60 * 60))
+
+
+def create_upload_session(user_id, intake_id, extension, size):
+    """Record a new session and create its empty staging file"""
+    UploadSession = current_app.config.get('UploadSession')
+    app = current_app._get_current_object()
+
+    purge_expired_upload_sessions()
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        intake_id=intake_id,
+        extension=extension,
+        size=size,
+        received=0,
+        expires_at=session_expiry(app)
+    )
+    open(session_path(app, session.id), 'wb').close()
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def write_chunk(session, offset, stream):
+    """Copy a request body into the staging file at offset without holding it in memory.
+    Returns the number of bytes written."""
+    app = current_app._get_current_object()
+    written = 0
+    with open(session_path(app, session.id), 'r+b') as staged:
+        staged.seek(offset)
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            if offset + written + len(chunk) > session.size:
+                raise ChunkOutOfRange()
+            staged.write(chunk)
+            written += len(chunk)
+
+    # A retried chunk may overlap bytes already received; only growth moves the offset
+    session.received = max(session.received, offset + written)
+    session.expires_at = session_expiry(app)
+    db.session.commit()
+    return written
+
+
+def discard_upload_session(session):
+    """Delete a session and whatever is left of its staging file"""
+    path = session_path(current_app, session.id)
+    if os.path.exists(path):
+        os.remove(path)
+    db.session.delete(session)
+
+
+def purge_expired_upload_sessions():
+    """Delete abandoned sessions and their staging files"""
+    UploadSession = current_app.config.get('UploadSession')
+
+    expired = UploadSession.query.filter(UploadSession.expires_at < datetime.utcnow()).all()
+    for session in expired:
+        discard_upload_session(session)
+    if expired:
+        db.session.commit()
+    return len(expired)
+
+
+@click.command('purge-upload-sessions')
+@with_appcontext
+def purge_upload_sessions_command():
+    """Delete expired upload sessions and their staging files."""
+    click.echo(f'Purged {purge_expired_upload_sessions()} expired upload sessions')